@@ -11,7 +11,7 @@ from database.repository import ConfigRepository
 from database.database import get_db
 from dependencies import get_config_repo
 from schemas.config import RenewRequest
-from utils.config import reinstall_config
+from utils.config import reinstall_config, resume_config
 
 
 logging.basicConfig(level=logging.INFO)
@@ -24,10 +24,13 @@ router = APIRouter()
 @router.post("/{config_id}/")
 async def get_config(
     config_id: int,
-    repo: ConfigRepository = Depends(get_config_repo)
+    repo: ConfigRepository = Depends(get_config_repo),
+    db: Session = Depends(get_db)
 ):
     config = repo.get_by_id(config_id)
     if config:
+        # Пользователь вернулся: пир мог быть снят с интерфейса за простой
+        await resume_config(config, db)
         from main_gateway import CONFIGS_DIR
         config_path = (
             CONFIGS_DIR / f"{config.user_id}_{config.config_name}.conf"
@@ -52,6 +55,7 @@ async def renew_config(
     config_id: int,
     body: RenewRequest,
     repo: ConfigRepository = Depends(get_config_repo),
+    db: Session = Depends(get_db)
 ):
     months = body.months
     try:
@@ -60,6 +64,7 @@ async def renew_config(
             raise HTTPException(status_code=404, detail="Config not found")
 
         repo.add_expires(config_id, months)
+        await resume_config(config, db)
         return {"status": "renewed", "new_expires": config.expires_at}
     except Exception as e:
         logger.error(f"Error renewing config {config_id}: {e}")
@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends
+from fastapi.exceptions import HTTPException
 from sqlalchemy.orm import Session
 
 from database.database import get_db
 from database.repository import ServerRepository
-from dependencies import get_server_repo
+from dependencies import get_server_repo, get_token_server_id
+from schemas.server import Heartbeat
+from utils.health import health
+from utils.placement import placement
 
 router = APIRouter()
 
@@ -23,3 +27,42 @@ async def get_statuses(
             'recv_traffic': server.recv_traffic
         }
     return response
+
+
+@router.post('/heartbeats/')
+async def receive_heartbeats(
+    heartbeats: list[Heartbeat],
+    server_repo: ServerRepository = Depends(get_server_repo),
+    token_server_id: int = Depends(get_token_server_id)
+):
+    """Пачка heartbeat'ов от VPN-сервера, только о нем самом"""
+    if any(heartbeat.server_id != token_server_id for heartbeat in heartbeats):
+        raise HTTPException(
+            status_code=403,
+            detail="Heartbeat другого сервера отклонен"
+        )
+    updated = server_repo.apply_heartbeats(heartbeats)
+    servers = server_repo.get_by_server_ids(
+        [heartbeat.server_id for heartbeat in heartbeats]
+    )
+    # Heartbeat - успешная проверка ноды, down-нода возвращается в up
+    # только после нескольких подряд
+    status_changes = {}
+    for server in servers:
+        changed = health.record_success(server)
+        if changed is not None:
+            status_changes[server.id] = changed
+    if status_changes:
+        server_repo.apply_statuses([], status_changes)
+    for server in servers:
+        if health.is_up(server):
+            placement.update(server)
+        else:
+            placement.remove(server.id)
+    return {"updated": updated}
+
+
+@router.get('/health/')
+async def get_health():
+    """Состояние здоровья нод: up, suspect, down или probing"""
+    return health.snapshot()
@@ -6,7 +6,8 @@ from sqlalchemy.orm import Session
 from database.database import get_db
 from schemas.server import CreateRequestUser
 from utils.config import get_conf
-from utils.server import get_server
+from utils.server import ensure_placement, release_server, reserve_server
+from utils.placement import placement
 from database.repository import (
     ServerRepository,
     ConfigRepository,
@@ -27,32 +28,47 @@ async def get_available_server(
     config_repo: ConfigRepository = Depends(get_config_repo),
     db: Session = Depends(get_db),
 ):
-    available_server = get_server(db)
+    available_server = reserve_server(
+        db, countries=data.preferred_countries()
+    )
 
     if not available_server:
         raise HTTPException(status_code=503, detail="Все серверы заполнены")
 
-    config_path = await get_conf(
-        data.user_id, available_server, db, data.config_name
-    )
-    if not config_path:
-        raise HTTPException(
-            status_code=500, detail="Не удалось создать конфигурацию"
+    # Место уже занято: при любой ошибке ниже его нужно вернуть
+    try:
+        config_path = await get_conf(
+            data.user_id, available_server, db, data.config_name
         )
-    config = config_repo.create(
-        user_id=data.user_id,
-        server_id=available_server.id,
-        config_name=data.config_name,
-        months=data.months
-    )
-    if not config:
-        raise HTTPException(
-            status_code=500, detail="Не удалось сохранить конфигурацию"
+        if not config_path:
+            raise HTTPException(
+                status_code=500, detail="Не удалось создать конфигурацию"
+            )
+        config = config_repo.create(
+            user_id=data.user_id,
+            server_id=available_server.id,
+            config_name=data.config_name,
+            months=data.months
         )
-    available_server.count_users += 1
-    db.commit()
+        if not config:
+            raise HTTPException(
+                status_code=500, detail="Не удалось сохранить конфигурацию"
+            )
+    except Exception:
+        db.rollback()
+        release_server(db, available_server.id)
+        raise
 
     return FileResponse(
         config_path,
         filename=f"{data.user_id}_{data.config_name}.conf"
     )
+
+
+@router.get("/free_slots/")
+async def get_free_slots(
+    server_repo: ServerRepository = Depends(get_server_repo),
+):
+    """Свободные места по странам из реестра размещения"""
+    ensure_placement(server_repo)
+    return placement.free_slots()
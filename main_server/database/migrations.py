@@ -0,0 +1,56 @@
+import logging
+
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from database.models import Servers
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Колонки, добавленные в существующие таблицы после первого релиза:
+# create_all создает только новые таблицы, старые нужно догнать ALTER TABLE
+ADDED_COLUMNS = {
+    Servers.__table__: [
+        "free_ips", "active_peers", "version", "last_heartbeat",
+    ],
+}
+
+
+def _column_ddl(column, dialect) -> str:
+    ddl = f"{column.name} {column.type.compile(dialect=dialect)}"
+    default = column.default
+    if default is not None and default.is_scalar:
+        # Существующие строки получают то же значение, что и новые
+        ddl += f" DEFAULT {default.arg!r}"
+    return ddl
+
+
+def migrate(engine: Engine):
+    """
+    Добавляет недостающие колонки и их индексы, вызывается при старте
+    после create_all. Повторный запуск ничего не меняет: колонки сверяются
+    с фактической схемой, а на PostgreSQL ALTER TABLE дополнительно
+    идет с IF NOT EXISTS на случай параллельного старта.
+    """
+    clause = "IF NOT EXISTS " if engine.dialect.name == "postgresql" else ""
+    inspector = inspect(engine)
+
+    with engine.begin() as conn:
+        for table, names in ADDED_COLUMNS.items():
+            existing = {
+                column["name"] for column in inspector.get_columns(table.name)
+            }
+            for name in names:
+                if name in existing:
+                    continue
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD COLUMN {clause}"
+                    f"{_column_ddl(table.c[name], engine.dialect)}"
+                )
+                logger.info(f"Миграция: добавлена колонка {table.name}.{name}")
+            for index in table.indexes:
+                if set(index.columns.keys()) & set(names):
+                    index.create(conn, checkfirst=True)
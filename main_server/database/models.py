@@ -21,6 +21,10 @@ class Servers(Base):
     memory_usage = Column(Float, default=0)
     sent_traffic = Column(Float, default=0)
     recv_traffic = Column(Float, default=0)
+    free_ips = Column(Integer, default=0)
+    active_peers = Column(Integer, default=0)
+    version = Column(String(50), nullable=True)
+    last_heartbeat = Column(DateTime, nullable=True, index=True)
 
 
 class User(Base):
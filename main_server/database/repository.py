@@ -3,6 +3,7 @@ import logging
 
 
 from typing import Optional, List
+from sqlalchemy import bindparam, update
 from sqlalchemy.orm import Session
 
 
@@ -89,25 +90,140 @@ class ServerRepository(BaseRepository):
             self.model.server_id == server_id
         ).first()
 
+    def get_by_server_ids(self, server_ids: list[int]) -> List[Servers]:
+        return self.db.query(self.model).filter(
+            self.model.server_id.in_(server_ids)
+        ).all()
+
     def get_all_active(self) -> List[Servers]:
         return self.db.query(self.model).filter(
             self.model.status.is_(True),
             self.model.ip != 'bot'
         ).all()
 
-    def add_user(self, server_id: int) -> bool:
-        server = self.get_by_id(server_id)
-        if not server:
-            logger.warning(f"[ServerRepository] Server not found: {server_id}")
-            return False
-        try:
-            server.count_users += 1
-            self.db.commit()
-            return True
-        except Exception as e:
-            self.db.rollback()
-            logger.error(f"[ServerRepository] Error adding user: {e}")
-            return False
+    def get_all_nodes(self) -> List[Servers]:
+        """Все VPN-ноды, включая неактивные: их повторно проверяет монитор"""
+        return self.db.query(self.model).filter(self.model.ip != 'bot').all()
+
+    def apply_heartbeats(self, heartbeats: list) -> int:
+        """
+        Обновляет серверы по пачке heartbeat'ов одним UPDATE (executemany).
+        От каждого сервера берется самый свежий heartbeat пачки.
+        status не трогается: его меняет только машина состояний здоровья.
+        """
+        latest = {}
+        for heartbeat in sorted(heartbeats, key=lambda hb: hb.sent_at):
+            latest[heartbeat.server_id] = heartbeat
+        if not latest:
+            return 0
+
+        received_at = datetime.datetime.utcnow()
+        table = self.model.__table__
+        self.db.execute(
+            update(table)
+            .where(table.c.server_id == bindparam('b_server_id'))
+            .values(
+                cpu_percent=bindparam('cpu'),
+                memory_usage=bindparam('memory'),
+                sent_traffic=bindparam('sent_traffic'),
+                recv_traffic=bindparam('recv_traffic'),
+                free_ips=bindparam('free_ips'),
+                active_peers=bindparam('active_peers'),
+                version=bindparam('version'),
+                last_heartbeat=received_at,
+            ),
+            [
+                {
+                    'b_server_id': heartbeat.server_id,
+                    'cpu': heartbeat.cpu,
+                    'memory': heartbeat.memory,
+                    'sent_traffic': heartbeat.sent_traffic,
+                    'recv_traffic': heartbeat.recv_traffic,
+                    'free_ips': heartbeat.free_ips,
+                    'active_peers': heartbeat.active_peers,
+                    'version': heartbeat.version,
+                }
+                for heartbeat in latest.values()
+            ]
+        )
+        self.db.commit()
+        return len(latest)
+
+    def apply_statuses(
+        self, statuses: list[dict], status_changes: dict[int, bool]
+    ):
+        """
+        Результаты опроса нод одной транзакцией: метрики ответивших одним
+        UPDATE (executemany) и смена status у нод, перешедших в up или down.
+        """
+        table = self.model.__table__
+        if statuses:
+            self.db.execute(
+                update(table)
+                .where(table.c.id == bindparam('b_id'))
+                .values(
+                    cpu_percent=bindparam('cpu'),
+                    memory_usage=bindparam('memory'),
+                    sent_traffic=bindparam('sent_traffic'),
+                    recv_traffic=bindparam('recv_traffic'),
+                ),
+                [
+                    {
+                        'b_id': status['id'],
+                        'cpu': status['cpu'],
+                        'memory': status['memory'],
+                        'sent_traffic': status['sent_traffic'],
+                        'recv_traffic': status['recv_traffic'],
+                    }
+                    for status in statuses
+                ]
+            )
+        for status in (True, False):
+            server_ids = [
+                server_id for server_id, changed in status_changes.items()
+                if changed is status
+            ]
+            if server_ids:
+                self.db.execute(
+                    update(table)
+                    .where(table.c.id.in_(server_ids))
+                    .values(status=status)
+                )
+        self.db.commit()
+
+    def reserve_slot(self, server_id: int) -> Optional[int]:
+        """
+        Атомарно занимает место на активном сервере одним
+        UPDATE ... WHERE count_users < max_count_users RETURNING.
+        Возвращает новое count_users или None, если мест нет.
+        """
+        count_users = self.db.execute(
+            update(self.model)
+            .where(
+                self.model.id == server_id,
+                self.model.status.is_(True),
+                self.model.count_users < self.model.max_count_users
+            )
+            .values(count_users=self.model.count_users + 1)
+            .returning(self.model.count_users)
+        ).scalar()
+        self.db.commit()
+        return count_users
+
+    def release_slot(self, server_id: int) -> Optional[int]:
+        """Атомарно освобождает место. Возвращает новое count_users"""
+        count_users = self.db.execute(
+            update(self.model)
+            .where(self.model.id == server_id, self.model.count_users > 0)
+            .values(count_users=self.model.count_users - 1)
+            .returning(self.model.count_users)
+        ).scalar()
+        self.db.commit()
+        if count_users is None:
+            logger.warning(
+                f"[ServerRepository] Nothing to release on server: {server_id}"
+            )
+        return count_users
 
 
 class ConfigRepository(BaseRepository):
@@ -1,4 +1,5 @@
-from fastapi import Depends
+from fastapi import Depends, Request
+from fastapi.exceptions import HTTPException
 
 
 from database.database import get_db
@@ -24,3 +25,14 @@ def get_server_repo(db=Depends(get_db)):
 
 def get_transaction_repo(db=Depends(get_db)):
     return TransactionRepository(db)
+
+
+def get_token_server_id(request: Request) -> int:
+    """server_id из JWT ноды, проверенного VerifyMiddleware"""
+    payload = getattr(request.state, "token_payload", None) or {}
+    server_id = payload.get("server_id")
+    if server_id is None:
+        raise HTTPException(
+            status_code=403, detail="Токен выдан не VPN-серверу"
+        )
+    return int(server_id)
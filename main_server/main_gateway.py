@@ -9,7 +9,8 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from dotenv import load_dotenv
 from database.database import engine
 from database.models import Base
-from utils.monitor import monitor_vpn_servers
+from database.migrations import migrate
+from utils.monitor import MONITOR_INTERVAL, monitor_vpn_servers
 from utils.check_sub import check_sub
 from middlewares import VerifyMiddleware
 from api.config import router as config_router
@@ -31,8 +32,11 @@ CONFIGS_DIR.mkdir(exist_ok=True)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
+    migrate(engine)
     scheduler = AsyncIOScheduler()
-    scheduler.add_job(monitor_vpn_servers, 'interval', minutes=5)
+    scheduler.add_job(
+        monitor_vpn_servers, 'interval', seconds=MONITOR_INTERVAL
+    )
     scheduler.add_job(check_sub, 'interval', seconds=20)
     scheduler.start()
 
@@ -28,5 +28,7 @@ class VerifyMiddleware(BaseHTTPMiddleware):
                 content={"detail": data}
             )
 
+        # Payload проверенного токена доступен обработчикам
+        request.state.token_payload = data
         return await call_next(request)
 
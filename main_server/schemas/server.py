@@ -13,3 +13,24 @@ class CreateRequestUser(BaseModel):
     user_id: int
     config_name: str | None = None
     months: int
+    # Желаемая страна сервера или список стран по убыванию предпочтения
+    country: str | None = None
+    countries: list[str] | None = None
+
+    def preferred_countries(self) -> list[str] | None:
+        if self.countries:
+            return self.countries
+        return [self.country] if self.country else None
+
+
+class Heartbeat(BaseModel):
+    server_id: int
+    cpu: float
+    memory: float
+    sent_traffic: float
+    recv_traffic: float
+    free_ips: int
+    peers: int
+    active_peers: int
+    version: str
+    sent_at: float
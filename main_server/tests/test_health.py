@@ -0,0 +1,190 @@
+from types import SimpleNamespace
+
+import pytest
+
+import utils.health
+from utils.health import (
+    DOWN,
+    DOWN_AFTER,
+    PROBE_INTERVAL,
+    PROBE_INTERVAL_MAX,
+    PROBING,
+    SUSPECT,
+    UP,
+    UP_AFTER,
+    HealthRegistry,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(utils.health.time, "time", clock)
+    return clock
+
+
+def server(server_id: int = 1, status: bool = True):
+    return SimpleNamespace(id=server_id, status=status)
+
+
+def state(registry: HealthRegistry, server_id: int = 1) -> str:
+    return registry.snapshot()[server_id]["state"]
+
+
+def take_down(registry: HealthRegistry, node) -> list:
+    return [registry.record_failure(node) for _ in range(DOWN_AFTER)]
+
+
+def test_single_failure_only_suspects(clock):
+    registry = HealthRegistry()
+    node = server()
+
+    assert registry.record_failure(node) is None
+    assert state(registry) == SUSPECT
+    # suspect не участвует в размещении, но status в БД не меняется
+    assert registry.healthy([node]) == []
+    assert registry.due(node)
+
+
+def test_success_clears_suspect(clock):
+    registry = HealthRegistry()
+    node = server()
+    registry.record_failure(node)
+
+    assert registry.record_success(node) is None
+    assert state(registry) == UP
+    assert registry.snapshot()[1]["failures"] == 0
+
+
+def test_consecutive_failures_take_node_down(clock):
+    registry = HealthRegistry()
+    node = server()
+
+    changes = take_down(registry, node)
+
+    assert changes == [None] * (DOWN_AFTER - 1) + [False]
+    assert state(registry) == DOWN
+    assert registry.snapshot()[1]["next_probe_at"] == clock.now + PROBE_INTERVAL
+
+
+def test_down_node_is_probed_after_interval(clock):
+    registry = HealthRegistry()
+    node = server()
+    take_down(registry, node)
+
+    clock.now += PROBE_INTERVAL - 1
+    assert not registry.due(node)
+    assert state(registry) == DOWN
+
+    clock.now += 1
+    assert registry.due(node)
+    assert state(registry) == PROBING
+
+
+def test_failed_probe_doubles_interval_up_to_cap(clock):
+    registry = HealthRegistry()
+    node = server()
+    take_down(registry, node)
+
+    interval = PROBE_INTERVAL
+    while interval < PROBE_INTERVAL_MAX:
+        clock.now = registry.snapshot()[1]["next_probe_at"]
+        assert registry.due(node)
+        assert registry.record_failure(node) is None
+        interval = min(interval * 2, PROBE_INTERVAL_MAX)
+        assert state(registry) == DOWN
+        assert registry.snapshot()[1]["next_probe_at"] == clock.now + interval
+
+    clock.now = registry.snapshot()[1]["next_probe_at"]
+    registry.due(node)
+    registry.record_failure(node)
+    assert (
+        registry.snapshot()[1]["next_probe_at"]
+        == clock.now + PROBE_INTERVAL_MAX
+    )
+
+
+def test_probing_needs_consecutive_successes(clock):
+    registry = HealthRegistry()
+    node = server()
+    take_down(registry, node)
+    clock.now += PROBE_INTERVAL
+    registry.due(node)
+
+    changes = [registry.record_success(node) for _ in range(UP_AFTER)]
+
+    assert changes == [None] * (UP_AFTER - 1) + [True]
+    assert state(registry) == UP
+    assert registry.healthy([node]) == [node]
+
+
+def test_recovery_resets_probe_interval(clock):
+    registry = HealthRegistry()
+    node = server()
+    take_down(registry, node)
+    clock.now += PROBE_INTERVAL
+    registry.due(node)
+    registry.record_failure(node)
+
+    clock.now += 2 * PROBE_INTERVAL
+    registry.due(node)
+    for _ in range(UP_AFTER):
+        registry.record_success(node)
+    take_down(registry, node)
+
+    assert registry.snapshot()[1]["next_probe_at"] == clock.now + PROBE_INTERVAL
+
+
+def test_heartbeat_brings_down_node_back_with_hysteresis(clock):
+    registry = HealthRegistry()
+    node = server()
+    take_down(registry, node)
+
+    # heartbeat'ы приходят раньше времени пробы
+    assert registry.record_success(node) is None
+    assert state(registry) == PROBING
+    for _ in range(UP_AFTER - 2):
+        registry.record_success(node)
+    assert registry.record_success(node) is True
+    assert state(registry) == UP
+
+
+def test_state_seeded_from_db_status(clock):
+    registry = HealthRegistry()
+    active, inactive = server(1, True), server(2, False)
+
+    registry.sync([active, inactive])
+
+    assert state(registry, 1) == UP
+    assert state(registry, 2) == DOWN
+    # Неактивная нода из БД проверяется на ближайшем тике
+    assert registry.due(inactive)
+    assert state(registry, 2) == PROBING
+
+
+def test_sync_forgets_removed_nodes(clock):
+    registry = HealthRegistry()
+    registry.sync([server(1), server(2)])
+
+    registry.sync([server(2)])
+
+    assert set(registry.snapshot()) == {2}
+
+
+def test_latency_is_smoothed(clock):
+    registry = HealthRegistry()
+    node = server()
+
+    registry.record_success(node, latency=1.0)
+    registry.record_success(node, latency=2.0)
+
+    expected = 1.0 + utils.health.LATENCY_SMOOTHING * (2.0 - 1.0)
+    assert registry.snapshot()[1]["latency"] == pytest.approx(expected)
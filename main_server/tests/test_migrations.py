@@ -0,0 +1,78 @@
+import datetime
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+
+from database.migrations import migrate
+from database.models import Servers
+
+
+OLD_SERVERS = """
+CREATE TABLE servers (
+    id INTEGER PRIMARY KEY,
+    country VARCHAR(200),
+    server_id INTEGER,
+    name VARCHAR(200),
+    ip VARCHAR(200),
+    max_count_users INTEGER,
+    count_users INTEGER,
+    status BOOLEAN,
+    cpu_percent FLOAT,
+    memory_usage FLOAT,
+    sent_traffic FLOAT,
+    recv_traffic FLOAT
+)
+"""
+
+
+def old_engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    with engine.begin() as conn:
+        conn.exec_driver_sql(OLD_SERVERS)
+        conn.exec_driver_sql(
+            "INSERT INTO servers (id, name, status) VALUES (1, 'old', 1)"
+        )
+    return engine
+
+
+def test_migrate_adds_heartbeat_columns_to_old_table():
+    engine = old_engine()
+
+    migrate(engine)
+
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("servers")}
+    assert columns == set(Servers.__table__.c.keys())
+    indexed = {
+        name
+        for index in inspector.get_indexes("servers")
+        for name in index["column_names"]
+    }
+    assert "last_heartbeat" in indexed
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT free_ips, active_peers, version FROM servers")
+        ).one()
+    assert tuple(row) == (0, 0, None)
+
+
+def test_migrate_is_idempotent():
+    engine = old_engine()
+    migrate(engine)
+
+    migrate(engine)
+
+    with engine.begin() as conn:
+        conn.execute(
+            Servers.__table__.update().values(
+                last_heartbeat=datetime.datetime(2026, 1, 1), version="1.2"
+            )
+        )
+        row = conn.execute(
+            text("SELECT version, last_heartbeat FROM servers")
+        ).one()
+    assert row.version == "1.2"
@@ -0,0 +1,140 @@
+from types import SimpleNamespace
+
+from utils.placement import PlacementRegistry
+
+
+def server(
+    server_id: int,
+    country: str = "de",
+    count_users: int = 0,
+    max_count_users: int = 10,
+    cpu: float = 0.0,
+):
+    return SimpleNamespace(
+        id=server_id,
+        country=country,
+        count_users=count_users,
+        max_count_users=max_count_users,
+        cpu_percent=cpu,
+        memory_usage=0.0,
+        sent_traffic=0.0,
+        recv_traffic=0.0,
+    )
+
+
+def test_best_is_least_loaded():
+    registry = PlacementRegistry()
+    registry.refresh([server(1, cpu=80), server(2, cpu=10), server(3, cpu=40)])
+
+    assert registry.best() == 2
+    assert registry.best(exclude=[2]) == 3
+
+
+def test_full_nodes_are_skipped():
+    registry = PlacementRegistry()
+    registry.refresh([
+        server(1, count_users=10),
+        server(2, count_users=9, cpu=90),
+    ])
+
+    assert registry.best() == 2
+    registry.set_users(2, 10)
+    assert registry.best() is None
+
+
+def test_update_reorders_with_lazy_deletion():
+    registry = PlacementRegistry()
+    registry.refresh([server(1, cpu=10), server(2, cpu=50)])
+
+    # Сглаживание: несколько замеров, чтобы нода 1 стала тяжелее ноды 2
+    for _ in range(10):
+        registry.update(server(1, cpu=100))
+
+    assert registry.best() == 2
+
+
+def test_removed_node_is_never_returned():
+    registry = PlacementRegistry()
+    registry.refresh([server(1), server(2, cpu=50)])
+
+    registry.remove(1)
+
+    assert registry.best() == 2
+    assert len(registry) == 1
+
+
+def test_set_users_rescores_without_monitor():
+    registry = PlacementRegistry()
+    registry.refresh([server(1), server(2)])
+
+    registry.set_users(1, 5)
+
+    assert registry.best() == 2
+
+
+def test_exclude_keeps_entries_for_later_calls():
+    registry = PlacementRegistry()
+    registry.refresh([server(1), server(2, cpu=50)])
+
+    assert registry.best(exclude=[1]) == 2
+    assert registry.best() == 1
+
+
+def test_heap_is_rebuilt_when_stale_entries_pile_up():
+    registry = PlacementRegistry()
+    registry.refresh([server(i) for i in range(1, 4)])
+
+    for users in range(1, 10):
+        for server_id in range(1, 4):
+            registry.set_users(server_id, users)
+
+    heap = registry._heaps["de"]
+    assert len(heap) <= 2 * len(registry) + 16
+    assert registry.best() in {1, 2, 3}
+
+
+def test_preferred_countries_in_order():
+    registry = PlacementRegistry()
+    registry.refresh([
+        server(1, "de", cpu=90),
+        server(2, "nl", cpu=10),
+        server(3, "fi", cpu=0),
+    ])
+
+    assert registry.best(countries=["de", "nl"]) == 1
+    assert registry.best(countries=["pl", "nl"]) == 2
+
+
+def test_falls_back_to_global_best_when_countries_full():
+    registry = PlacementRegistry()
+    registry.refresh([
+        server(1, "de", count_users=10),
+        server(2, "nl", cpu=50),
+        server(3, "fi", cpu=10),
+    ])
+
+    assert registry.best(countries=["de"]) == 3
+
+
+def test_free_slots_index_follows_every_change():
+    registry = PlacementRegistry()
+    registry.refresh([
+        server(1, "de", count_users=2),
+        server(2, "de", count_users=10),
+        server(3, "nl", count_users=0, max_count_users=5),
+    ])
+    assert registry.free_slots() == {"de": 8, "nl": 5}
+
+    registry.set_users(1, 3)
+    registry.update(server(3, "nl", count_users=1, max_count_users=5))
+    assert registry.free_slots() == {"de": 7, "nl": 4}
+
+    # Нода сменила страну
+    registry.update(server(2, "nl", count_users=4))
+    assert registry.free_slots() == {"de": 7, "nl": 10}
+
+    registry.remove(1)
+    assert registry.free_slots() == {"de": 0, "nl": 10}
+
+    registry.refresh([server(3, "nl", count_users=5, max_count_users=5)])
+    assert registry.free_slots() == {"nl": 0}
@@ -9,7 +9,7 @@ from sqlalchemy.orm import Session
 from database.database import get_db
 from database.models import Servers
 from database.repository import ServerRepository, ConfigRepository, BaseRepository
-from utils.server import get_server
+from utils.server import release_server, reserve_server
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,11 +21,7 @@ async def get_conf(
         config_name: str | None = None
 ) -> str:
     try:
-        server_repo = ServerRepository(db)
-
         async with httpx.AsyncClient() as client:
-            token = token_repo.get_by_server(server.id)
-
             response = await client.post(
                 f"http://{server.ip}:8000/client/generate-config/",
                 json={
@@ -35,6 +31,9 @@ async def get_conf(
             )
             if response.status_code == 401:
                 raise HTTPException(status_code=401, detail='Unauthorized')
+            # Ошибку ноды (нет IP, нода не готова) нельзя сохранять как
+            # конфиг: исключение вернет место на сервере
+            response.raise_for_status()
             logger.info(f"{user_id} запрошен конфиг на сервере {server.id} {response.content}")
             # Сохраняем конфигурацию на диск
             from main_gateway import CONFIGS_DIR
@@ -43,19 +42,6 @@ async def get_conf(
             with open(config_path, "wb") as file:
                 file.write(response.content)
 
-            # Добавляем пользователя на сервер через репозиторий
-            if not server_repo.add_user(server_id=server.id):
-                logger.error(
-                    (
-                        f"Не удалось добавить пользователя {user_id} "
-                        f"на сервер {server.id}"
-                    )
-                )
-                raise HTTPException(
-                    status_code=500,
-                    detail="Ошибка при добавлении пользователя"
-                )
-
             return str(config_path)
 
     except httpx.HTTPStatusError as e:
@@ -71,6 +57,31 @@ async def get_conf(
         )
 
 
+async def resume_config(config, db: Session):
+    """
+    Просит ноду вернуть на интерфейс пира, снятого за неактивность.
+    Ошибка ноды не мешает выдаче конфига, поэтому только логируется.
+    """
+    server = ServerRepository(db).get_by_id(config.server_id)
+    if not server:
+        return
+    try:
+        async with httpx.AsyncClient(timeout=5) as client:
+            response = await client.post(
+                f"http://{server.ip}:8000/client/resume-config/",
+                json={
+                    "user_id": config.user_id,
+                    "config_name": config.config_name,
+                }
+            )
+            response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.warning(
+            f"Не удалось вернуть пира {config.user_id}_{config.config_name} "
+            f"на сервере {server.id}: {e}"
+        )
+
+
 async def delete_config(
         user_id: int, config_name: str,
         db: Session
@@ -107,6 +118,7 @@ async def delete_config(
     if os.path.exists(path):
         os.remove(path)
     config_repo.delete(config.id)
+    release_server(db, server.id)
 
     return {"status": "deleted"}
 
@@ -126,19 +138,28 @@ async def reinstall_config(
     if not server:
         raise HTTPException(status_code=404, detail="Server not found")
 
-    new_server = get_server(db, exclude=[server.id])
-
-    await delete_config(
-        user_id=config.user_id,
-        config_name=config.config_name,
-        db=db
-    )
-    await get_conf(
-        user_id=config.user_id,
-        server=new_server,
-        db=db,
-        config_name=config.config_name
+    # Переносим в ту же страну, если там есть место
+    new_server = reserve_server(
+        db, exclude=[server.id], countries=[server.country]
     )
+    if not new_server:
+        raise HTTPException(status_code=503, detail="Все серверы заполнены")
+
+    try:
+        await delete_config(
+            user_id=config.user_id,
+            config_name=config.config_name,
+            db=db
+        )
+        await get_conf(
+            user_id=config.user_id,
+            server=new_server,
+            db=db,
+            config_name=config.config_name
+        )
+    except Exception:
+        release_server(db, new_server.id)
+        raise
     new_config = BaseRepository.create(
         config_repo,
         user_id=config.user_id,
@@ -0,0 +1,193 @@
+import os
+import time
+import logging
+import threading
+
+
+from typing import Iterable, Optional
+
+
+from database.models import Servers
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+UP = "up"
+SUSPECT = "suspect"
+DOWN = "down"
+PROBING = "probing"
+
+# Подряд неудачных опросов до перевода в down
+DOWN_AFTER = int(os.getenv('HEALTH_DOWN_AFTER', 3))
+# Подряд удачных проб до возврата в up
+UP_AFTER = int(os.getenv('HEALTH_UP_AFTER', 2))
+# Первая повторная проба down-ноды и предел экспоненциального роста, секунды
+PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', 60))
+PROBE_INTERVAL_MAX = float(os.getenv('HEALTH_PROBE_INTERVAL_MAX', 3600))
+# Вес нового замера в скользящем среднем задержки
+LATENCY_SMOOTHING = 0.3
+
+
+class NodeHealth:
+    """Состояние одной ноды"""
+
+    __slots__ = (
+        "state", "failures", "successes", "latency",
+        "probe_interval", "next_probe_at", "changed_at",
+    )
+
+    def __init__(self, state: str, now: float):
+        self.state = state
+        self.failures = 0
+        self.successes = 0
+        self.latency: Optional[float] = None
+        self.probe_interval = PROBE_INTERVAL
+        # down-нода с неизвестной историей проверяется на ближайшем тике
+        self.next_probe_at = now
+        self.changed_at = now
+
+    def as_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "successes": self.successes,
+            "latency": self.latency,
+            "next_probe_at": (
+                self.next_probe_at if self.state == DOWN else None
+            ),
+            "changed_at": self.changed_at,
+        }
+
+
+class HealthRegistry:
+    """
+    Машина состояний здоровья нод:
+
+        up --ошибка--> suspect --DOWN_AFTER ошибок подряд--> down
+        suspect --успех--> up
+        down --пришло время пробы--> probing
+        probing --UP_AFTER успехов подряд--> up
+        probing --ошибка--> down, интервал пробы удваивается
+
+    Для размещения годятся только ноды в up. В БД status=True у up и
+    suspect, чтобы единичный сбой сети не выключал ноду; down и probing
+    хранятся как status=False. Методы record_* возвращают новое значение
+    status, если его нужно записать в БД, иначе None.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes: dict[int, NodeHealth] = {}
+
+    def _get(self, server: Servers, now: float) -> NodeHealth:
+        node = self._nodes.get(server.id)
+        if node is None:
+            # После перезапуска шлюза исходное состояние берется из БД
+            node = NodeHealth(UP if server.status else DOWN, now)
+            self._nodes[server.id] = node
+        return node
+
+    def _set_state(self, server_id: int, node: NodeHealth, state: str, now: float):
+        logger.info(f"Сервер {server_id}: {node.state} -> {state}")
+        node.state = state
+        node.changed_at = now
+
+    def sync(self, servers: Iterable[Servers]):
+        """Заводит состояние для новых нод и забывает удаленные"""
+        now = time.time()
+        with self._lock:
+            nodes = {}
+            for server in servers:
+                nodes[server.id] = self._get(server, now)
+            self._nodes = nodes
+
+    def due(self, server: Servers) -> bool:
+        """
+        Нужно ли опрашивать ноду на этом тике. down-нода, у которой
+        подошло время пробы, переходит в probing.
+        """
+        now = time.time()
+        with self._lock:
+            node = self._get(server, now)
+            if node.state != DOWN:
+                return True
+            if now < node.next_probe_at:
+                return False
+            node.successes = 0
+            self._set_state(server.id, node, PROBING, now)
+            return True
+
+    def record_success(
+        self, server: Servers, latency: Optional[float] = None
+    ) -> Optional[bool]:
+        now = time.time()
+        with self._lock:
+            node = self._get(server, now)
+            if latency is not None:
+                if node.latency is None:
+                    node.latency = latency
+                else:
+                    node.latency += LATENCY_SMOOTHING * (latency - node.latency)
+            node.failures = 0
+
+            if node.state == SUSPECT:
+                self._set_state(server.id, node, UP, now)
+            elif node.state in (DOWN, PROBING):
+                if node.state == DOWN:
+                    # Нода ответила сама (heartbeat) раньше пробы
+                    node.successes = 0
+                    self._set_state(server.id, node, PROBING, now)
+                node.successes += 1
+                if node.successes >= UP_AFTER:
+                    node.probe_interval = PROBE_INTERVAL
+                    self._set_state(server.id, node, UP, now)
+                    return True
+            return None
+
+    def record_failure(self, server: Servers) -> Optional[bool]:
+        now = time.time()
+        with self._lock:
+            node = self._get(server, now)
+            node.failures += 1
+            node.successes = 0
+
+            if node.state == UP:
+                self._set_state(server.id, node, SUSPECT, now)
+                if node.failures < DOWN_AFTER:
+                    return None
+            if node.state == SUSPECT and node.failures >= DOWN_AFTER:
+                node.next_probe_at = now + node.probe_interval
+                self._set_state(server.id, node, DOWN, now)
+                return False
+            if node.state == PROBING:
+                node.probe_interval = min(
+                    node.probe_interval * 2, PROBE_INTERVAL_MAX
+                )
+                node.next_probe_at = now + node.probe_interval
+                self._set_state(server.id, node, DOWN, now)
+            return None
+
+    def is_up(self, server: Servers) -> bool:
+        with self._lock:
+            return self._get(server, time.time()).state == UP
+
+    def healthy(self, servers: Iterable[Servers]) -> list[Servers]:
+        """Ноды в состоянии up"""
+        now = time.time()
+        with self._lock:
+            return [
+                server for server in servers
+                if self._get(server, now).state == UP
+            ]
+
+    def snapshot(self) -> dict[int, dict]:
+        with self._lock:
+            return {
+                server_id: node.as_dict()
+                for server_id, node in self._nodes.items()
+            }
+
+
+health = HealthRegistry()
@@ -1,5 +1,9 @@
+import os
+import time
+import asyncio
 import logging
-import requests
+import datetime
+import httpx
 
 
 from sqlalchemy.orm import Session
@@ -7,30 +11,115 @@ from sqlalchemy.orm import Session
 
 from database.database import get_db
 from database.repository import ServerRepository
+from utils.health import health
+from utils.placement import placement
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def monitor_vpn_servers():
+# Период тика монитора, секунды: на тиках опрашиваются ноды в up, suspect
+# и probing, down-ноды - когда подошло время повторной пробы
+MONITOR_INTERVAL = int(os.getenv('MONITOR_INTERVAL', 60))
+# Серверы со свежим heartbeat не опрашиваются
+HEARTBEAT_TTL = int(os.getenv('HEARTBEAT_TTL', 90))
+# Одновременных запросов к нодам и общий лимит времени на одну ноду
+MONITOR_CONCURRENCY = int(os.getenv('MONITOR_CONCURRENCY', 100))
+MONITOR_TIMEOUT = float(os.getenv('MONITOR_TIMEOUT', 5))
+
+
+async def poll_server(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    server_id: int,
+    ip: str
+) -> dict:
+    """Статус одной ноды, не дольше MONITOR_TIMEOUT секунд"""
+    async with semaphore:
+        started_at = time.perf_counter()
+        response = await asyncio.wait_for(
+            client.get(f"http://{ip}:8000/status"), MONITOR_TIMEOUT
+        )
+        latency = time.perf_counter() - started_at
+    response.raise_for_status()
+    data = response.json()
+    return {
+        'id': server_id,
+        'cpu': data["cpu"],
+        'memory': data["memory"],
+        'sent_traffic': data["sent_traffic"],
+        'recv_traffic': data["recv_traffic"],
+        'latency': latency,
+    }
+
+
+async def monitor_vpn_servers():
+    """
+    Опрос /status нод без свежего heartbeat, которые нужно проверить на
+    этом тике (см. utils.health). Запросы идут параллельно через общий
+    клиент, не больше MONITOR_CONCURRENCY сразу, результаты пишутся в БД
+    одним пакетом.
+    """
     db: Session = next(get_db())
-    servers = ServerRepository(db).get_all_active()
+    try:
+        await poll_servers(ServerRepository(db))
+    finally:
+        await asyncio.to_thread(db.close)
 
-    for server in servers:
-        try:
-            # Отправка запроса с API-ключом в заголовках
-            response = requests.get(
-                f"http://{server.ip}:8000/status", timeout=10
+
+async def poll_servers(server_repo: ServerRepository):
+    # Синхронный SQLAlchemy - в потоке, чтобы медленная БД не держала
+    # event loop шлюза
+    servers = await asyncio.to_thread(server_repo.get_all_nodes)
+    health.sync(servers)
+    fresh_since = datetime.datetime.utcnow() - datetime.timedelta(
+        seconds=HEARTBEAT_TTL
+    )
+    targets = [
+        server for server in servers
+        if not (server.last_heartbeat and server.last_heartbeat >= fresh_since)
+        and health.due(server)
+    ]
+
+    if targets:
+        semaphore = asyncio.Semaphore(MONITOR_CONCURRENCY)
+        async with httpx.AsyncClient(
+            timeout=MONITOR_TIMEOUT,
+            limits=httpx.Limits(max_connections=MONITOR_CONCURRENCY),
+        ) as client:
+            results = await asyncio.gather(
+                *(
+                    poll_server(client, semaphore, server.id, server.ip)
+                    for server in targets
+                ),
+                return_exceptions=True
             )
-            data = response.json()
-            server.cpu_percent = data["cpu"]
-            server.memory_usage = data["memory"]
-            server.sent_traffic = data["sent_traffic"]
-            server.recv_traffic = data["recv_traffic"]
-
-            db.commit()
-        except Exception as e:
-            logger.error(f"Ошибка опроса сервера {server.name}: {str(e)}")
-            server.status = False
-            db.commit()
\ No newline at end of file
+
+        statuses = []
+        failed = 0
+        status_changes = {}
+        for server, result in zip(targets, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    f"Ошибка опроса сервера {server.name}: "
+                    f"{str(result) or type(result).__name__}"
+                )
+                failed += 1
+                changed = health.record_failure(server)
+            else:
+                changed = health.record_success(server, result.pop('latency'))
+                statuses.append(result)
+            if changed is not None:
+                status_changes[server.id] = changed
+        await asyncio.to_thread(
+            server_repo.apply_statuses, statuses, status_changes
+        )
+        logger.info(
+            f"Опрос серверов: {len(statuses)} ответили, "
+            f"{failed} недоступны"
+        )
+
+    # Свежие данные здоровых серверов - в реестр размещения
+    active = await asyncio.to_thread(server_repo.get_all_active)
+    placement.refresh(health.healthy(active))
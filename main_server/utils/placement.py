@@ -0,0 +1,239 @@
+import os
+import heapq
+import logging
+import threading
+
+
+from typing import Iterable, Optional
+
+
+from database.models import Servers
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Вклад каждой составляющей в оценку загрузки ноды (меньше - свободнее)
+CAPACITY_WEIGHT = 0.4
+CPU_WEIGHT = 0.3
+MEMORY_WEIGHT = 0.1
+BANDWIDTH_WEIGHT = 0.2
+# Пропускная способность ноды, МБ/с: трафик выше считается полной загрузкой
+BANDWIDTH_CAPACITY = float(os.getenv('BANDWIDTH_CAPACITY', 100))
+# Вес нового замера в скользящем среднем CPU, памяти и трафика
+SMOOTHING = 0.3
+
+
+class NodeLoad:
+    """Сглаженная загрузка одной ноды и ее текущая оценка"""
+
+    __slots__ = (
+        "id", "country", "count_users", "max_count_users",
+        "cpu", "memory", "bandwidth", "score", "version",
+    )
+
+    def __init__(self, server: Servers):
+        self.id = server.id
+        self.country = server.country
+        self.count_users = server.count_users or 0
+        self.max_count_users = server.max_count_users or 0
+        self.cpu = server.cpu_percent or 0.0
+        self.memory = server.memory_usage or 0.0
+        self.bandwidth = (
+            (server.sent_traffic or 0.0) + (server.recv_traffic or 0.0)
+        )
+        self.score = 0.0
+        self.version = 0
+
+    def observe(self, server: Servers):
+        self.country = server.country
+        self.count_users = server.count_users or 0
+        self.max_count_users = server.max_count_users or 0
+        bandwidth = (server.sent_traffic or 0.0) + (server.recv_traffic or 0.0)
+        self.cpu += SMOOTHING * ((server.cpu_percent or 0.0) - self.cpu)
+        self.memory += SMOOTHING * ((server.memory_usage or 0.0) - self.memory)
+        self.bandwidth += SMOOTHING * (bandwidth - self.bandwidth)
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.count_users < self.max_count_users
+
+    @property
+    def free_slots(self) -> int:
+        return max(self.max_count_users - self.count_users, 0)
+
+    def compute_score(self) -> float:
+        capacity = self.count_users / self.max_count_users
+        return (
+            CAPACITY_WEIGHT * capacity
+            + CPU_WEIGHT * min(self.cpu / 100, 1.0)
+            + MEMORY_WEIGHT * min(self.memory / 100, 1.0)
+            + BANDWIDTH_WEIGHT * min(self.bandwidth / BANDWIDTH_CAPACITY, 1.0)
+        )
+
+
+class PlacementRegistry:
+    """
+    Реестр нод для выбора сервера под нового пользователя.
+
+    Для каждой страны своя куча нод по оценке загрузки, выбор наименее
+    загруженной ноды страны работает за O(log n). Изменение оценки не ищет
+    старую запись в куче: добавляется новая с увеличенной версией,
+    устаревшие записи отбрасываются при извлечении (ленивое удаление).
+    Полные ноды в кучи не попадают. Число свободных мест по странам
+    поддерживается при каждом изменении ноды, без обхода таблицы.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes: dict[int, NodeLoad] = {}
+        self._heaps: dict[str, list[tuple[float, int, int]]] = {}
+        self._free_slots: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _detach(self, node: NodeLoad):
+        """Убирает вклад ноды в свободные места перед ее изменением"""
+        self._free_slots[node.country] -= node.free_slots
+
+    def _attach(self, node: NodeLoad):
+        """Учитывает ноду после изменения: места и новая запись в куче"""
+        self._free_slots[node.country] = (
+            self._free_slots.get(node.country, 0) + node.free_slots
+        )
+        node.version += 1
+        if not node.has_capacity:
+            return
+        node.score = node.compute_score()
+        heap = self._heaps.setdefault(node.country, [])
+        heapq.heappush(heap, (node.score, node.id, node.version))
+        # Куча разрослась из-за устаревших записей - пересобираем
+        if len(heap) > 2 * len(self._nodes) + 16:
+            self._rebuild()
+
+    def _rebuild(self):
+        heaps: dict[str, list[tuple[float, int, int]]] = {}
+        for node in self._nodes.values():
+            if node.has_capacity:
+                heaps.setdefault(node.country, []).append(
+                    (node.score, node.id, node.version)
+                )
+        for heap in heaps.values():
+            heapq.heapify(heap)
+        self._heaps = heaps
+
+    def _is_current(self, entry: tuple[float, int, int]) -> bool:
+        node = self._nodes.get(entry[1])
+        return node is not None and node.version == entry[2]
+
+    def _best_in(
+        self, country: str, exclude: set[int]
+    ) -> Optional[tuple[float, int, int]]:
+        heap = self._heaps.get(country)
+        if not heap:
+            return None
+        skipped = []
+        best = None
+        while heap:
+            entry = heap[0]
+            if not self._is_current(entry):
+                heapq.heappop(heap)
+                continue
+            if entry[1] in exclude:
+                skipped.append(heapq.heappop(heap))
+                continue
+            best = entry
+            break
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        return best
+
+    def refresh(self, servers: Iterable[Servers]):
+        """
+        Полное обновление по активным серверам (тик монитора): новые
+        добавляются, отсутствующие удаляются, кучи строятся за O(n).
+        """
+        with self._lock:
+            nodes = {}
+            free_slots: dict[str, int] = {}
+            for server in servers:
+                node = self._nodes.get(server.id)
+                if node is None:
+                    node = NodeLoad(server)
+                else:
+                    node.observe(server)
+                node.version += 1
+                if node.has_capacity:
+                    node.score = node.compute_score()
+                nodes[server.id] = node
+                free_slots[node.country] = (
+                    free_slots.get(node.country, 0) + node.free_slots
+                )
+            self._nodes = nodes
+            self._free_slots = free_slots
+            self._rebuild()
+
+    def update(self, server: Servers):
+        """Новые данные одной ноды (heartbeat), O(log n)"""
+        with self._lock:
+            node = self._nodes.get(server.id)
+            if node is None:
+                node = self._nodes[server.id] = NodeLoad(server)
+            else:
+                self._detach(node)
+                node.observe(server)
+            self._attach(node)
+
+    def remove(self, server_id: int):
+        with self._lock:
+            # Записи в куче станут устаревшими и отбросятся при извлечении
+            node = self._nodes.pop(server_id, None)
+            if node is not None:
+                self._detach(node)
+
+    def set_users(self, server_id: int, count_users: int):
+        """
+        Новое число пользователей после резерва или освобождения места:
+        пересчет оценки без ожидания монитора
+        """
+        with self._lock:
+            node = self._nodes.get(server_id)
+            if node is not None:
+                self._detach(node)
+                node.count_users = count_users
+                self._attach(node)
+
+    def best(
+        self,
+        exclude: Iterable[int] = (),
+        countries: Optional[list[str]] = None
+    ) -> Optional[int]:
+        """
+        id наименее загруженной ноды с местом, не из exclude. Страны из
+        countries перебираются по порядку предпочтения; если места нет ни
+        в одной из них, выбирается лучшая нода среди всех стран.
+        """
+        exclude = set(exclude)
+        with self._lock:
+            for country in countries or ():
+                entry = self._best_in(country, exclude)
+                if entry is not None:
+                    return entry[1]
+
+            entries = [
+                entry for entry in (
+                    self._best_in(country, exclude) for country in self._heaps
+                )
+                if entry is not None
+            ]
+            return min(entries)[1] if entries else None
+
+    def free_slots(self) -> dict[str, int]:
+        """Свободные места на активных нодах по странам"""
+        with self._lock:
+            return dict(self._free_slots)
+
+
+placement = PlacementRegistry()
@@ -3,27 +3,57 @@ from sqlalchemy.orm import Session
 
 
 from database.repository import ServerRepository
+from utils.health import health
+from utils.placement import placement
 
 
-def get_server(
+def ensure_placement(server_repo: ServerRepository):
+    """Заполняет реестр из БД, если монитор еще не успел (сразу после старта)"""
+    if len(placement):
+        return
+    servers = health.healthy(server_repo.get_all_active())
+    if not servers:
+        raise HTTPException(status_code=503, detail="Нет доступных серверов")
+    placement.refresh(servers)
+
+
+def reserve_server(
         db: Session,
         exclude: list[int] = [],
+        countries: list[str] | None = None,
 ):
     """
-    Получаем сервер, который не в списке исключений
+    Выбираем наименее загруженный сервер, который не в списке исключений,
+    и атомарно занимаем на нем место. При неудаче дальнейшего создания
+    конфига место нужно вернуть через release_server.
     :param db: сессия базы данных
     :param exclude: список исключенных серверов
-    :return: сервер
+    :param countries: страны по убыванию предпочтения
+    :return: сервер или None, если все серверы заполнены
     """
     server_repo = ServerRepository(db)
-    servers = server_repo.get_all_active()
+    ensure_placement(server_repo)
+
+    exclude = set(exclude)
+    while True:
+        server_id = placement.best(exclude, countries)
+        if server_id is None:
+            return None
+        count_users = server_repo.reserve_slot(server_id)
+        if count_users is not None:
+            placement.set_users(server_id, count_users)
+            return server_repo.get_by_id(server_id)
+        # Место заняли параллельно или реестр отстал от БД:
+        # обновляем ноду и берем следующую
+        server = server_repo.get_by_id(server_id)
+        if server and server.status and health.is_up(server):
+            placement.update(server)
+        else:
+            placement.remove(server_id)
 
-    if not servers:
-        raise HTTPException(status_code=503, detail="Нет доступных серверов")
 
-    for server in servers:
-        if len(servers) == 1:
-            return server
-        if (server.id not in exclude and server.count_users < server.max_count_users):
-            return server
-    return None
+def release_server(db: Session, server_id: int):
+    """Возвращаем место на сервере: конфиг не создан или удален"""
+    count_users = ServerRepository(db).release_slot(server_id)
+    if count_users is not None:
+        placement.set_users(server_id, count_users)
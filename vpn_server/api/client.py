@@ -1,19 +1,39 @@
+import time
 import subprocess
 import logging
 
 
+from ipaddress import IPv4Network
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import Response
+from sqlalchemy.exc import IntegrityError
 
 
-from dependencies import get_ip_repository, get_client_repository
+from dependencies import (
+    get_ip_repository,
+    get_client_repository,
+    get_ip_allocator,
+)
 from database.repository import IPRepository, ClientRepository
-from core.wg import (
-    generate_keys,
-    add_client_to_server_config,
-    delete_client_from_server_config,
+from core.ip_allocator import IPAllocator
+from core.idle_peers import idle_peers
+from core.key_pool import key_pool
+from core.metrics import (
+    POOL_EXHAUSTED,
+    REQUEST_FAILURES,
+    observe_wg_apply,
+    stage,
+    timed,
+)
+from core.peer_store import PeerChange
+from core.wg_queue import wg_queue
+from schemas.client import (
+    CreateClientRequest,
+    CreateClientsRequest,
+    DeleteClientRequest,
+    DeleteClientsRequest,
+    ResumeClientRequest,
 )
-from schemas.client import CreateClientRequest, DeleteClientRequest
 
 
 logging.basicConfig(level=logging.INFO)
@@ -23,33 +43,17 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-@router.post("/generate-config/")
-async def generate_config(
-    request: CreateClientRequest,
-    ip_repo: IPRepository = Depends(get_ip_repository),
-    client_repo: ClientRepository = Depends(get_client_repository)
-):
-
+def render_config(private_key: str, address: str) -> str:
     from main_vpn import (
         DNS,
+        SERVER_IP_POOL,
         SERVER_PUBLIC_KEY,
         SERVER_ENDPOINT,
-        CONFIGS_DIR,
     )
 
-    # Генерируем ключи
-    private_key, public_key = generate_keys()
-
-    # Выделяем IP
-    client_ip = ip_repo.get_free_ip()
-    if not client_ip:
-        raise HTTPException(400, "Нет свободных IP-адресов")
-    ip_repo.mark_ip_used(client_ip, request.user_id)
-
-    # Создаем конфиг клиента
-    config = f"""[Interface]
+    return f"""[Interface]
 PrivateKey = {private_key}
-Address = {client_ip.address}/24
+Address = {address}/{IPv4Network(SERVER_IP_POOL).prefixlen}
 DNS = {DNS}
 
 [Peer]
@@ -59,73 +63,290 @@ AllowedIPs = 0.0.0.0/0
 PersistentKeepalive = 25
 """
 
-    config_filename = f"{request.user_id}_{request.config_name}.conf"
-    config_path = CONFIGS_DIR / config_filename
-    logger.info(f"Сохраняем конфиг клиента: {config}")
-    with open(config_path, "w") as f:
-        f.write(config)
+
+def config_response(user_id: int, config_name: str, config: str) -> Response:
+    return Response(
+        content=config.encode(),
+        media_type="application/octet-stream",
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{user_id}_{config_name}.conf"'
+            )
+        }
+    )
+
+
+@router.post("/generate-config/")
+@timed("generate_config")
+async def generate_config(
+    request: CreateClientRequest,
+    ip_repo: IPRepository = Depends(get_ip_repository),
+    client_repo: ClientRepository = Depends(get_client_repository),
+    ip_allocator: IPAllocator = Depends(get_ip_allocator)
+):
+    endpoint = "generate_config"
+
+    # Генерируем ключи
+    with stage(endpoint, "keygen"):
+        private_key, public_key = key_pool.get()
+
+    # Выделяем IP
+    with stage(endpoint, "ip_alloc"):
+        client_ip = await ip_allocator.allocate(ip_repo, request.user_id)
+        if not client_ip:
+            POOL_EXHAUSTED.inc()
+            raise HTTPException(400, "Нет свободных IP-адресов")
 
     # Добавляем клиента на сервер
+    start = time.perf_counter()
     try:
-        add_client_to_server_config(public_key, client_ip.address)
-    except subprocess.CalledProcessError:
+        timings = await wg_queue.add_peer(public_key, client_ip.address)
+    except Exception as e:
+        logger.error(f"Ошибка добавления пира {public_key}: {e}")
+        REQUEST_FAILURES.labels(endpoint, "wg_apply").inc()
+        # IP уже закоммичен как занятый - освобождаем
+        await ip_allocator.free(ip_repo, client_ip)
         raise HTTPException(500, "Ошибка добавления клиента")
+    observe_wg_apply(endpoint, time.perf_counter() - start, timings)
 
     # Сохраняем в бд
-    client = client_repo.create(
-        client_id=request.user_id,
-        private_key=private_key,
-        public_key=public_key,
-        ip_address=client_ip.id,
-        config_name=request.config_name
-    )
-    if not client:
+    try:
+        with stage(endpoint, "db_commit"):
+            await client_repo.create(
+                client_id=request.user_id,
+                private_key=private_key,
+                public_key=public_key,
+                ip_address=client_ip.id,
+                config_name=request.config_name
+            )
+    except Exception as e:
+        logger.error(f"Ошибка создания клиента {request.user_id}: {e}")
+        await client_repo.db.rollback()
+        # Пир и IP уже применены - откатываем, иначе их найдет только
+        # сверка
+        await wg_queue.remove_peer(public_key)
+        await ip_allocator.free(ip_repo, client_ip)
+        if isinstance(e, IntegrityError):
+            raise HTTPException(409, "Конфиг с таким именем уже существует")
         raise HTTPException(500, "Ошибка создания клиента")
 
-    return FileResponse(
-        path=config_path,
-        filename=config_filename,
-        media_type="application/octet-stream"
+    # Конфиг клиента собирается в памяти, без записи на диск
+    return config_response(
+        request.user_id,
+        request.config_name,
+        render_config(private_key, client_ip.address)
+    )
+
+
+@router.get("/config/{user_id}/{config_name}/")
+async def get_config(
+    user_id: int,
+    config_name: str,
+    client_repo: ClientRepository = Depends(get_client_repository)
+):
+    """
+    Повторно собирает конфиг существующего клиента из БД. Снятый за
+    неактивность пир возвращается на интерфейс.
+    """
+    row = await client_repo.get_with_address(user_id, config_name)
+    if not row:
+        raise HTTPException(404, "Клиент не найден")
+    client, address = row
+    try:
+        await idle_peers.resume(client.public_key)
+    except Exception as e:
+        # Конфиг отдаем все равно: пира вернет повторный запрос или
+        # resume-config
+        logger.error(f"Ошибка возврата пира {client.public_key}: {e}")
+    return config_response(
+        user_id, config_name, render_config(client.privat_key, address)
+    )
+
+
+@router.post("/resume-config/")
+async def resume_config(
+    request: ResumeClientRequest,
+    client_repo: ClientRepository = Depends(get_client_repository)
+):
+    """Возвращает на интерфейс пира, снятого за неактивность"""
+    client = await client_repo.get_by_id_and_name(
+        request.user_id, request.config_name
     )
+    if not client:
+        raise HTTPException(404, "Клиент не найден")
+    try:
+        resumed = await idle_peers.resume(client.public_key)
+    except subprocess.CalledProcessError:
+        raise HTTPException(500, "Ошибка настройки сервера")
+    return {"status": "resumed" if resumed else "active"}
+
+
+@router.post("/generate-configs/")
+async def generate_configs(
+    request: CreateClientsRequest,
+    ip_repo: IPRepository = Depends(get_ip_repository),
+    client_repo: ClientRepository = Depends(get_client_repository),
+    ip_allocator: IPAllocator = Depends(get_ip_allocator)
+):
+    """
+    Пакетное создание клиентов: все пиры применяются одним обновлением
+    WireGuard, IP и клиенты сохраняются одной транзакцией.
+    """
+    # Генерируем ключи
+    keys = [key_pool.get() for _ in request.clients]
+
+    # Выделяем IP в одной транзакции
+    client_ips = []
+    try:
+        for item in request.clients:
+            client_ip = await ip_allocator.allocate(
+                ip_repo, item.user_id, commit=False
+            )
+            if not client_ip:
+                raise HTTPException(400, "Нет свободных IP-адресов")
+            client_ips.append(client_ip)
+    except Exception:
+        await ip_repo.db.rollback()
+        ip_allocator.put_back(client_ips)
+        raise
+
+    # Добавляем всех клиентов на сервер одним изменением
+    peers = [
+        PeerChange(public_key, f"{client_ip.address}/32")
+        for (_, public_key), client_ip in zip(keys, client_ips)
+    ]
+    try:
+        await wg_queue.apply(peers)
+    except Exception as e:
+        logger.error(f"Ошибка пакетного добавления пиров: {e}")
+        await ip_repo.db.rollback()
+        ip_allocator.put_back(client_ips)
+        raise HTTPException(500, "Ошибка добавления клиентов")
+
+    # Сохраняем в бд
+    try:
+        await client_repo.create_many([
+            {
+                "client_id": item.user_id,
+                "private_key": private_key,
+                "public_key": public_key,
+                "ip_address": client_ip.id,
+                "config_name": item.config_name,
+            }
+            for item, (private_key, public_key), client_ip
+            in zip(request.clients, keys, client_ips)
+        ])
+    except Exception as e:
+        logger.error(f"Ошибка пакетного создания клиентов: {e}")
+        await client_repo.db.rollback()
+        ip_allocator.put_back(client_ips)
+        await wg_queue.apply([PeerChange(peer.public_key) for peer in peers])
+        if isinstance(e, IntegrityError):
+            raise HTTPException(409, "Конфиг с таким именем уже существует")
+        raise HTTPException(500, "Ошибка создания клиентов")
+
+    return {
+        "configs": [
+            {
+                "user_id": item.user_id,
+                "config_name": item.config_name,
+                "config": render_config(private_key, client_ip.address),
+            }
+            for item, (private_key, _), client_ip
+            in zip(request.clients, keys, client_ips)
+        ]
+    }
 
 
 @router.post("/delete-config/")
+@timed("delete_config")
 async def delete_config(
     request: DeleteClientRequest,
     ip_repo: IPRepository = Depends(get_ip_repository),
-    client_repo: ClientRepository = Depends(get_client_repository)
+    client_repo: ClientRepository = Depends(get_client_repository),
+    ip_allocator: IPAllocator = Depends(get_ip_allocator)
 ):
-
-    from main_vpn import (
-        CONFIGS_DIR,
-    )
+    endpoint = "delete_config"
 
     # Получаем клиента из БД
-    client = client_repo.get_by_id_and_name(
+    client = await client_repo.get_by_id_and_name(
         request.user_id, request.config_name
     )
     if not client:
         logger.error(f"Клиент с user_id {request.user_id} и config_name {request.config_name} не найден")
         raise HTTPException(404, "Клиент не найден")
 
-    ip = ip_repo.db.query(ip_repo.model).filter_by(id=client.ip_address).first()
+    ip = await ip_repo.get_by_id(client.ip_address)
     if not ip:
         logger.error(f"IP-адрес для клиента {client.public_key} не найден")
         raise HTTPException(404, "IP-адрес не найден")
 
+    start = time.perf_counter()
     try:
-        delete_client_from_server_config(client.public_key)
+        timings = await wg_queue.remove_peer(client.public_key)
     except subprocess.CalledProcessError:
+        REQUEST_FAILURES.labels(endpoint, "wg_apply").inc()
         raise HTTPException(500, "Ошибка настройки сервера")
+    observe_wg_apply(endpoint, time.perf_counter() - start, timings)
 
-    # Удаляем клиента из БД и освобождаем IP
-    client_repo.delete(client)
-    ip_repo.free_ip(ip)
+    await idle_peers.forget([client.public_key])
 
-    # Удаляем файл конфига
-    config_filename = f"{request.user_id}_{request.config_name}.conf"
-    config_path = CONFIGS_DIR / config_filename
-    if config_path.exists():
-        config_path.unlink()
+    # Удаляем клиента из БД и освобождаем IP
+    with stage(endpoint, "db_commit"):
+        await client_repo.delete(client)
+        await ip_allocator.free(ip_repo, ip)
 
     return {"status": "success"}
+
+
+@router.post("/delete-configs/")
+async def delete_configs(
+    request: DeleteClientsRequest,
+    ip_repo: IPRepository = Depends(get_ip_repository),
+    client_repo: ClientRepository = Depends(get_client_repository),
+    ip_allocator: IPAllocator = Depends(get_ip_allocator)
+):
+    """
+    Пакетное удаление клиентов: одно изменение WireGuard и одна
+    транзакция, освобождающая все IP. Результат по каждому элементу.
+    """
+
+    pairs = [(item.user_id, item.config_name) for item in request.clients]
+    clients = {
+        (client.client_id, client.config_name): client
+        for client in await client_repo.get_by_ids_and_names(pairs)
+    }
+    # После rollback ORM-объекты истекают: статусы ставятся по парам,
+    # а не по атрибутам клиентов
+    found_pairs = [pair for pair in dict.fromkeys(pairs) if pair in clients]
+    found = [clients[pair] for pair in found_pairs]
+    public_keys = [client.public_key for client in found]
+    ips = await ip_repo.get_by_ids([client.ip_address for client in found])
+
+    statuses = {pair: "not_found" for pair in pairs}
+    if found:
+        try:
+            await wg_queue.apply([PeerChange(key) for key in public_keys])
+            await ip_repo.release_many([ip.id for ip in ips], commit=False)
+            await client_repo.delete_many(found)
+        except Exception as e:
+            logger.error(f"Ошибка пакетного удаления клиентов: {e}")
+            await client_repo.db.rollback()
+            for pair in found_pairs:
+                statuses[pair] = "error"
+        else:
+            ip_allocator.put_back(ips)
+            await idle_peers.forget(public_keys)
+            for pair in found_pairs:
+                statuses[pair] = "deleted"
+
+    return {
+        "results": [
+            {
+                "user_id": user_id,
+                "config_name": config_name,
+                "status": statuses[(user_id, config_name)],
+            }
+            for user_id, config_name in pairs
+        ]
+    }
@@ -1,8 +1,23 @@
-import psutil
-import time
+import asyncio
+import logging
 
+from typing import Optional
 from fastapi import APIRouter, Response
-from prometheus_client import Gauge, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Gauge,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from core.ip_allocator import ip_allocator
+from core.metrics import FREE_IPS
+from core.peer_stats import PeerStats, peer_stats
+from core.sampler import system_sampler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -11,29 +26,70 @@ MEM_USAGE = Gauge('server_memory_usage_percent', 'Memory usage percent')
 BYTES_SENT = Gauge('server_bytes_sent_per_sec', 'Bytes sent per second')
 BYTES_RECV = Gauge('server_bytes_recv_per_sec', 'Bytes received per second')
 
-prev_net_io = psutil.net_io_counters()
-prev_time = time.time()
 
+class PeerStatsMetrics:
+    """
+    Метрики пиров из последнего снимка PeerStats. Значения отдаются прямо
+    из массивов снимка при сериализации, без отдельного Gauge-потомка на
+    каждую метку: удаленные пиры пропадают вместе со снимком.
+    """
 
-@router.get("")
-async def metrics():
-    global prev_net_io, prev_time
+    def __init__(self):
+        self.stats: Optional[PeerStats] = None
+
+    def _families(self):
+        return (
+            GaugeMetricFamily(
+                'wg_peer_rx_bytes_per_sec', 'Peer bytes received per second',
+                labels=['public_key']
+            ),
+            GaugeMetricFamily(
+                'wg_peer_tx_bytes_per_sec', 'Peer bytes sent per second',
+                labels=['public_key']
+            ),
+            GaugeMetricFamily(
+                'wg_peer_latest_handshake_seconds',
+                'Peer latest handshake timestamp',
+                labels=['public_key']
+            ),
+        )
 
-    CPU_USAGE.set(psutil.cpu_percent(interval=0.1))
-    MEM_USAGE.set(psutil.virtual_memory().percent)
+    def describe(self):
+        return self._families()
 
-    current_net_io = psutil.net_io_counters()
-    current_time = time.time()
+    def collect(self):
+        rx_rate, tx_rate, handshake = self._families()
+        stats = self.stats
+        if stats is not None:
+            for i, key in enumerate(stats.keys):
+                labels = [key]
+                rx_rate.add_metric(labels, stats.rx_rate[i])
+                tx_rate.add_metric(labels, stats.tx_rate[i])
+                handshake.add_metric(labels, stats.latest_handshake[i])
+        return rx_rate, tx_rate, handshake
 
-    bytes_sent = current_net_io.bytes_sent - prev_net_io.bytes_sent
-    bytes_recv = current_net_io.bytes_recv - prev_net_io.bytes_recv
-    time_diff = current_time - prev_time
 
-    if time_diff > 0:
-        BYTES_SENT.set(bytes_sent / time_diff)
-        BYTES_RECV.set(bytes_recv / time_diff)
+PEER_METRICS = PeerStatsMetrics()
+REGISTRY.register(PEER_METRICS)
+
+
+@router.get("")
+async def metrics():
+    sample = system_sampler.latest()
+    if sample is not None:
+        CPU_USAGE.set(sample.cpu)
+        MEM_USAGE.set(sample.memory)
+        BYTES_SENT.set(sample.sent_per_sec)
+        BYTES_RECV.set(sample.recv_per_sec)
+    FREE_IPS.set(ip_allocator.free_count)
 
-    prev_net_io = current_net_io
-    prev_time = current_time
+    try:
+        PEER_METRICS.stats = await asyncio.to_thread(peer_stats.collect)
+    except Exception as e:
+        # Без wg show отдаем хотя бы метрики хоста
+        logger.error(f"Ошибка при получении статистики пиров: {e}")
+        PEER_METRICS.stats = None
 
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    # Сериализация десятков тысяч строк не должна блокировать event loop
+    body = await asyncio.to_thread(generate_latest)
+    return Response(body, media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+
+
+from fastapi import APIRouter, Depends
+from fastapi.exceptions import HTTPException
+
+
+from dependencies import get_client_repository
+from database.repository import ClientRepository
+from core.idle_peers import idle_peers
+from core.peer_stats import peer_stats
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get('')
+async def get_peers(
+    client_repo: ClientRepository = Depends(get_client_repository)
+):
+    """Трафик и последний handshake по каждому пиру с привязкой к клиенту"""
+    try:
+        stats = await asyncio.to_thread(peer_stats.collect)
+    except Exception as e:
+        logger.error(f"Ошибка при получении статистики пиров: {e}")
+        raise HTTPException(
+            status_code=500, detail='Ошибка в получении статистики пиров'
+        )
+
+    clients = await client_repo.get_peer_index()
+    peers = []
+    for i, key in enumerate(stats.keys):
+        client = clients.get(key)
+        peers.append({
+            "public_key": key,
+            "client_id": client.client_id if client else None,
+            "config_name": client.config_name if client else None,
+            "endpoint": stats.endpoints[i],
+            "latest_handshake": stats.latest_handshake[i],
+            "rx_bytes": stats.rx_bytes[i],
+            "tx_bytes": stats.tx_bytes[i],
+            "rx_rate": stats.rx_rate[i],
+            "tx_rate": stats.tx_rate[i],
+        })
+    return {"taken_at": stats.taken_at, "peers": peers}
+
+
+@router.get('/idle')
+async def get_idle_peers(
+    client_repo: ClientRepository = Depends(get_client_repository)
+):
+    """Пиры без handshake дольше IDLE_TIMEOUT по последней проверке"""
+    clients = await client_repo.get_peer_index()
+    peers = []
+    for peer in idle_peers.idle_peers:
+        client = clients.get(peer.public_key)
+        peers.append({
+            **peer._asdict(),
+            "client_id": client.client_id if client else None,
+            "config_name": client.config_name if client else None,
+        })
+    return {
+        "timeout": idle_peers.timeout,
+        "suspend": idle_peers.suspend,
+        "peers": peers,
+    }
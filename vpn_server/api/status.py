@@ -1,12 +1,16 @@
 import logging
 
 
-import psutil
-import time
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from fastapi.exceptions import HTTPException
 
 
-from fastapi import APIRouter
-from fastapi.exceptions import HTTPException
+from core.sampler import sample_to_dict, system_sampler
+from core.reconciler import reconciler
+from core.registration import registration
+from core.startup import startup
+from dependencies import require_ready
 
 
 logging.basicConfig(level=logging.INFO)
@@ -15,45 +19,47 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-prev_net_io = psutil.net_io_counters()
-prev_time = time.time()
-
-
-@router.get('')
+# Пока нода не готова, проверка шлюза не должна считать ее здоровой
+@router.get('', dependencies=[Depends(require_ready)])
 async def get_status():
     try:
-        global prev_net_io, prev_time
-        cpu = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory().percent
-
-        current_net_io = psutil.net_io_counters()
-        current_time = time.time()
-
-        # Вычисляем разницу в байтах
-        bytes_sent = current_net_io.bytes_sent - prev_net_io.bytes_sent
-        bytes_recv = current_net_io.bytes_recv - prev_net_io.bytes_recv
-
-        # Вычисляем разницу во времени
-        time_diff = current_time - prev_time
-
-        mb_sent = bytes_sent / (1024 * 1024)
-        mb_recv = bytes_recv / (1024 * 1024)
-
-        mb_sent_per_sec = mb_sent / time_diff
-        mb_recv_per_sec = mb_recv / time_diff
-
-        # Обновляем предыдущие значения
-        prev_net_io = current_net_io
-        prev_time = current_time
+        # Последний замер фонового сборщика, без ожидания
+        sample = system_sampler.latest()
+        if sample is None:
+            sample = system_sampler.sample()
 
         return {
-            "cpu": cpu,
-            "memory": memory,
-            "sent_traffic": mb_sent_per_sec,
-            "recv_traffic": mb_recv_per_sec,
+            **sample_to_dict(sample),
+            "avg_1m": sample_to_dict(system_sampler.average(60)),
+            "avg_5m": sample_to_dict(system_sampler.average(300)),
         }
     except Exception as e:
         logger.error(f"Ошибка при получении статуса сервера: {e}")
         raise HTTPException(
             status_code=500, detail='Ошибка в получении статуса сервера'
         )
+
+
+@router.get('/reconcile')
+async def get_reconcile_report():
+    """Результат последней сверки БД и WireGuard"""
+    report = reconciler.last_report
+    return report._asdict() if report else None
+
+
+@router.get('/ready')
+async def get_readiness():
+    """Готовность ноды и состояние регистрации на main_server"""
+    return JSONResponse(
+        status_code=200 if startup.ready else 503,
+        content={
+            "ready": startup.ready,
+            "serving_after": startup.serving_after,
+            "ready_after": startup.ready_after,
+            "startup_error": startup.last_error,
+            "registration": registration.state,
+            "registration_attempts": registration.attempts,
+            "registration_error": registration.last_error,
+            "token_expires_at": registration.expires_at,
+        }
+    )
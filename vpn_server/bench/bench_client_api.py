@@ -0,0 +1,161 @@
+"""
+Пропускная способность /client/generate-config/ и /client/delete-config/,
+запросов в секунду и задержки p50/p99.
+
+По умолчанию нода поднимается в процессе на fake-backend WireGuard и
+SQLite (--db-url postgresql+asyncpg://... для Postgres). С --url запросы
+идут в уже запущенную ноду: так сравниваются версии до и после изменения
+на одной и той же БД. На SQLite результат упирается в ее блокировку
+записи и годится только для грубого сравнения, цифры для прода - на
+Postgres.
+
+    cd vpn_server && python bench/bench_client_api.py -n 2000 -c 50
+    python bench/bench_client_api.py --url http://127.0.0.1:8000 -n 2000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from contextlib import asynccontextmanager
+from ipaddress import IPv4Network
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@asynccontextmanager
+async def local_node(db_url: str, pool: str, concurrency: int):
+    """Нода в процессе, без lifespan: пул IP, писатель wg_queue, готовность"""
+    os.environ["WG_BACKEND"] = "fake"
+    os.environ["SERVER_IP_POOL"] = pool
+    os.environ.setdefault("SERVER_PUBLIC_KEY", "server-public-key")
+    os.environ.setdefault("SERVER_ENDPOINT", "203.0.113.1")
+
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    import main_vpn
+    from database.database import Base, SessionLocal
+    from database.models import IPAddress
+    from core.ip_allocator import ip_allocator
+    from core.startup import startup
+    from core.wg_queue import wg_queue
+
+    if db_url.startswith("sqlite"):
+        # Пул соединений вместо NullPool по умолчанию, иначе замеряется
+        # открытие SQLite. Запись SQLite сериализует: запросы ждут блокировку
+        engine = create_async_engine(
+            db_url,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=concurrency,
+            connect_args={"timeout": 30},
+        )
+    else:
+        engine = create_async_engine(db_url, pool_size=concurrency)
+    SessionLocal.configure(bind=engine)
+    main_vpn.engine = engine
+
+    async def prepare():
+        if not db_url.startswith("sqlite"):
+            await main_vpn.prepare_node()
+            return
+        # init_ip_pool рассчитан на Postgres (ON CONFLICT), для SQLite
+        # пул заполняется напрямую
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+            await conn.run_sync(Base.metadata.create_all)
+        async with SessionLocal() as db:
+            db.add_all(
+                IPAddress(address=str(ip), is_used=False)
+                for ip in IPv4Network(pool).hosts()
+            )
+            await db.commit()
+            await ip_allocator.load(db, pool)
+
+    await startup.run(prepare)
+    queue_task = asyncio.create_task(wg_queue.run())
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main_vpn.app),
+            base_url="http://node",
+        ) as client:
+            yield client
+    finally:
+        queue_task.cancel()
+        await engine.dispose()
+
+
+async def run_phase(
+    client: httpx.AsyncClient, path: str, payloads: list[dict], concurrency: int
+) -> tuple[float, list[float], int]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(payload: dict):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(path, json=payload)
+            latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(payload) for payload in payloads))
+    return time.perf_counter() - start, sorted(latencies), errors
+
+
+def report(name: str, elapsed: float, latencies: list[float], errors: int):
+    count = len(latencies)
+    p50 = latencies[count // 2] * 1000
+    p99 = latencies[min(int(count * 0.99), count - 1)] * 1000
+    print(
+        f"{name:8} {count / elapsed:10,.0f} запр/с   "
+        f"p50 {p50:7.1f} мс   p99 {p99:7.1f} мс   ошибок {errors}"
+    )
+
+
+async def bench(args):
+    payloads = [
+        {"user_id": 900000 + i, "config_name": f"bench-{os.getpid()}-{i}"}
+        for i in range(args.count)
+    ]
+    if args.url:
+        node = httpx.AsyncClient(
+            base_url=args.url,
+            timeout=60,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        )
+    else:
+        db_url = args.db_url or (
+            f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='bench-')}/node.db"
+        )
+        node = local_node(db_url, args.pool, args.concurrency)
+
+    async with node as client:
+        report("generate", *await run_phase(
+            client, "/client/generate-config/", payloads, args.concurrency
+        ))
+        report("delete", *await run_phase(
+            client, "/client/delete-config/", payloads, args.concurrency
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--count", type=int, default=1000)
+    parser.add_argument("-c", "--concurrency", type=int, default=50)
+    parser.add_argument("--url", help="запущенная нода вместо ноды в процессе")
+    parser.add_argument("--db-url", help="БД ноды в процессе")
+    parser.add_argument("--pool", default="10.64.0.0/20")
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
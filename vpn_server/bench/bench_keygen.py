@@ -0,0 +1,62 @@
+"""
+Скорость генерации ключей WireGuard, пар в секунду: в процессе
+(core.wg.generate_keys), из пула KeyPool и через подпроцессы
+`wg genkey` + `wg pubkey`, как было раньше. Подпроцессы замеряются,
+только если wg установлен.
+
+    cd vpn_server && python bench/bench_keygen.py -n 5000
+"""
+import sys
+import time
+import shutil
+import argparse
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.key_pool import KeyPool  # noqa: E402
+from core.wg import generate_keys  # noqa: E402
+
+
+def subprocess_keys() -> tuple[str, str]:
+    private_key = subprocess.check_output(["wg", "genkey"], text=True).strip()
+    public_key = subprocess.check_output(
+        ["wg", "pubkey"], input=private_key, text=True
+    ).strip()
+    return private_key, public_key
+
+
+def measure(func, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--count", type=int, default=5000)
+    parser.add_argument(
+        "--subprocess-count", type=int, default=500,
+        help="пар через wg: каждая стоит двух запусков процесса"
+    )
+    args = parser.parse_args()
+
+    in_process = measure(generate_keys, args.count)
+    print(f"в процессе:   {in_process:12,.0f} пар/с")
+
+    pool = KeyPool(size=args.count)
+    pool._keys.extend(generate_keys() for _ in range(args.count))
+    print(f"из пула:      {measure(pool.get, args.count):12,.0f} пар/с")
+
+    if shutil.which("wg") is None:
+        print("подпроцессы:  wg не найден, пропущено")
+        return
+    spawned = measure(subprocess_keys, args.subprocess_count)
+    print(f"подпроцессы:  {spawned:12,.0f} пар/с")
+    print(f"ускорение:    {in_process / spawned:12,.1f}x")
+
+
+if __name__ == "__main__":
+    main()
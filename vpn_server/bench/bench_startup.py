@@ -0,0 +1,101 @@
+"""
+Время запуска ноды: от старта приложения до первого 200 от /status/ready
+при пуле около 65 тысяч адресов (/16). Печатает время до приема запросов
+(serving_after), до готовности (ready_after) и до первого 200.
+
+Первый запуск с новой БД заполняет пул (холодный старт), повторный с тем
+же --db-path замеряет перезапуск на заполненной БД. Postgres - через
+--db-url postgresql+asyncpg://...
+
+    cd vpn_server && python bench/bench_startup.py --db-path /tmp/node.db
+    python bench/bench_startup.py --db-path /tmp/node.db
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+async def bench(args) -> dict:
+    os.environ["WG_BACKEND"] = "fake"
+    os.environ["SERVER_IP_POOL"] = args.pool
+    # Фоновые задачи, не влияющие на готовность, не запускаем
+    os.environ.setdefault("RECONCILE_INTERVAL", "0")
+    os.environ.setdefault("IDLE_TIMEOUT", "0")
+    os.environ.setdefault("HEARTBEAT_INTERVAL", "0")
+
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    import main_vpn
+    from core.registration import registration
+    from database.database import SessionLocal
+
+    engine = create_async_engine(args.db_url)
+    SessionLocal.configure(bind=engine)
+    main_vpn.engine = engine
+
+    async def no_registration():
+        """Шлюза нет: регистрация на время замера не нужна"""
+
+    registration.run = no_registration
+
+    start = time.perf_counter()
+    async with main_vpn.lifespan(main_vpn.app):
+        serving = time.perf_counter() - start
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main_vpn.app),
+            base_url="http://node",
+        ) as client:
+            while True:
+                response = await client.get("/status/ready")
+                if response.status_code == 200:
+                    break
+                await asyncio.sleep(0.01)
+        ready = time.perf_counter() - start
+    await engine.dispose()
+
+    data = response.json()
+    return {
+        "serving": serving,
+        "ready": ready,
+        "serving_after": data["serving_after"],
+        "ready_after": data["ready_after"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pool", default="10.64.0.0/16")
+    parser.add_argument("--db-path", help="файл SQLite, по умолчанию новый")
+    parser.add_argument("--db-url", help="вместо --db-path")
+    args = parser.parse_args()
+
+    warm = False
+    if not args.db_url:
+        path = Path(
+            args.db_path
+            or Path(tempfile.mkdtemp(prefix="bench-")) / "node.db"
+        )
+        warm = path.exists()
+        args.db_url = f"sqlite+aiosqlite:///{path}"
+
+    result = asyncio.run(bench(args))
+    print(f"старт: {'повторный' if warm else 'холодный'}, пул {args.pool}")
+    print(f"прием запросов:       {result['serving'] * 1000:9.1f} мс")
+    print(f"первый 200 от /ready: {result['ready'] * 1000:9.1f} мс")
+    print(
+        f"от импорта модуля:    serving_after "
+        f"{result['serving_after'] * 1000:.1f} мс, ready_after "
+        f"{result['ready_after'] * 1000:.1f} мс"
+    )
+
+
+if __name__ == "__main__":
+    main()
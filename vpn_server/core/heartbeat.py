@@ -0,0 +1,85 @@
+import time
+import asyncio
+import logging
+
+
+import httpx
+
+
+from core.ip_allocator import ip_allocator
+from core.peer_stats import peer_stats
+from core.registration import registration
+from core.sampler import sample_to_dict, system_sampler
+from core.startup import startup
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Пир с handshake не старше этого считается подключенным: WireGuard
+# обновляет сессию каждые 2 минуты, пока есть трафик
+ACTIVE_HANDSHAKE = 180
+
+
+class HeartbeatSender:
+    """
+    Периодическая отправка состояния ноды на main_server: нагрузка,
+    свободные IP, активные пиры и версия. Заменяет опрос /status со
+    стороны шлюза, шлюз принимает heartbeat'ы пачкой.
+    """
+
+    def __init__(self, interval: float = 30.0, timeout: float = 5.0):
+        self.interval = interval
+        self.timeout = timeout
+
+    async def build(self) -> dict:
+        from main_vpn import SERVER_ID, VERSION
+
+        sample = system_sampler.latest() or system_sampler.sample()
+        stats = await asyncio.to_thread(peer_stats.collect)
+        now = time.time()
+        active_peers = sum(
+            1 for handshake in stats.latest_handshake
+            if now - handshake <= ACTIVE_HANDSHAKE
+        )
+        return {
+            "server_id": int(SERVER_ID),
+            **sample_to_dict(sample),
+            "free_ips": ip_allocator.free_count,
+            "peers": len(stats),
+            "active_peers": active_peers,
+            "version": VERSION,
+            "sent_at": now,
+        }
+
+    async def send(self, client: httpx.AsyncClient):
+        from main_vpn import MAIN_SERVER
+
+        heartbeat = await self.build()
+        response = await client.post(
+            f"http://{MAIN_SERVER}/monitor/heartbeats/",
+            headers={"authorization": f"Bearer {registration.token}"},
+            json=[heartbeat],
+        )
+        if response.status_code == 401:
+            # Токен отозван или истек раньше срока - перерегистрируемся
+            registration.invalidate()
+        response.raise_for_status()
+
+    async def run(self):
+        """Фоновая отправка heartbeat'ов, запускается из lifespan"""
+        if self.interval <= 0:
+            return
+        await startup.wait_ready()
+        await registration.registered.wait()
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            while True:
+                try:
+                    await self.send(client)
+                except Exception as e:
+                    logger.warning(f"Heartbeat не отправлен: {e}")
+                await asyncio.sleep(self.interval)
+
+
+heartbeat_sender = HeartbeatSender()
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+
+
+from pathlib import Path
+from typing import NamedTuple
+from core.peer_stats import PeerStats, peer_stats
+from core.peer_store import PeerChange
+from core.wg import get_wg_backend
+from core.wg_queue import wg_queue
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class IdlePeer(NamedTuple):
+    public_key: str
+    # 0 - handshake не было ни разу
+    latest_handshake: int
+    idle_for: float
+    suspended: bool
+
+
+class IdlePeerTracker:
+    """
+    Поиск пиров без handshake дольше timeout секунд по снимкам peer_stats.
+
+    Простой считается от последнего handshake. Для пира, который еще ни
+    разу не подключался, отсчет идет с момента, когда он впервые попал в
+    снимок, для восстановленного через resume() - не раньше момента
+    восстановления. При suspend=True такие пиры снимаются с
+    runtime-интерфейса, а клиент, его IP и блок в wg0.conf остаются:
+    resume() возвращает пира из конфиг-файла. Список снятых хранится в
+    файле рядом с wg0.conf и переживает перезапуск процесса, сверка его
+    учитывает.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30 * 24 * 3600,
+        suspend: bool = False,
+        interval: float = 600.0
+    ):
+        self.timeout = timeout
+        self.suspend = suspend
+        self.interval = interval
+        self.idle_peers: list[IdlePeer] = []
+        # public key -> когда впервые замечен пир без единого handshake
+        self._first_seen: dict[str, float] = {}
+        # public key -> когда пир восстановлен через resume()
+        self._resumed_at: dict[str, float] = {}
+        # public key -> (latest handshake, последняя активность) на момент
+        # снятия с интерфейса
+        self.suspended: dict[str, tuple[int, float]] = {}
+        self._suspended_at = 0.0
+
+    @staticmethod
+    def _state_path() -> Path:
+        config_path = get_wg_backend().peer_store.path
+        return config_path.with_name(f"{config_path.stem}.suspended.json")
+
+    def load(self):
+        """Список снятых пиров из файла, вызывается при старте"""
+        path = self._state_path()
+        try:
+            state = json.loads(path.read_text())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать {path}: {e}")
+            return
+        self.suspended = {
+            key: (int(handshake), float(last_active))
+            for key, (handshake, last_active) in state.items()
+        }
+        logger.info(f"Снятых за неактивность пиров: {len(self.suspended)}")
+
+    def _write_state(self, state: dict[str, tuple[int, float]]):
+        path = self._state_path()
+        fd, tmp_path = tempfile.mkstemp(
+            dir=path.parent, prefix=f".{path.name}."
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    async def _save(self):
+        # Без файла снятый пир после перезапуска все равно узнается по
+        # отсутствию в runtime, поэтому ошибка записи не фатальна
+        try:
+            await asyncio.to_thread(self._write_state, dict(self.suspended))
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить список снятых пиров: {e}")
+
+    def _find_idle(self, stats: PeerStats, now: float) -> list[IdlePeer]:
+        self._first_seen = {
+            key: self._first_seen.get(key, now)
+            for key, handshake in zip(stats.keys, stats.latest_handshake)
+            if handshake == 0
+        }
+        # Старше timeout отметка восстановления уже ни на что не влияет
+        self._resumed_at = {
+            key: resumed_at for key, resumed_at in self._resumed_at.items()
+            if now - resumed_at < self.timeout
+        }
+
+        idle = []
+        for i, key in enumerate(stats.keys):
+            handshake = stats.latest_handshake[i]
+            since = max(
+                self._first_seen.get(key, 0.0), self._resumed_at.get(key, 0.0)
+            )
+            idle_for = now - max(handshake, since)
+            if idle_for >= self.timeout:
+                idle.append(IdlePeer(key, handshake, idle_for, False))
+        return idle
+
+    async def sweep(self) -> list[IdlePeer]:
+        now = time.time()
+        stats = await asyncio.to_thread(peer_stats.collect)
+        if stats.taken_at <= self._suspended_at:
+            # Снимок сделан до последнего снятия пиров и уже устарел
+            return self.idle_peers
+        idle = self._find_idle(stats, now)
+
+        # Пир снова в runtime (перезапуск wg-quick и т.п.) - уже не снят
+        returned = self.suspended.keys() & stats.index.keys()
+        for key in returned:
+            del self.suspended[key]
+        if returned:
+            await self._save()
+
+        if self.suspend and idle:
+            # Отмечаем до применения, чтобы resume() во время снятия
+            # вернул пира обратно
+            self._suspended_at = now
+            for peer in idle:
+                self.suspended[peer.public_key] = (
+                    peer.latest_handshake, now - peer.idle_for
+                )
+                self._first_seen.pop(peer.public_key, None)
+                self._resumed_at.pop(peer.public_key, None)
+            await self._save()
+            await wg_queue.apply_runtime(
+                [PeerChange(peer.public_key) for peer in idle]
+            )
+            logger.info(f"Снято с интерфейса неактивных пиров: {len(idle)}")
+            idle = [peer._replace(suspended=True) for peer in idle]
+
+        listed = {peer.public_key for peer in idle}
+        idle.extend(
+            IdlePeer(key, handshake, now - last_active, True)
+            for key, (handshake, last_active) in self.suspended.items()
+            if key not in listed
+        )
+        self.idle_peers = idle
+        return idle
+
+    async def _missing_from_runtime(self, public_key: str) -> bool:
+        """
+        Пир есть в wg0.conf, но не в runtime: снят прошлым процессом, а
+        файл со списком снятых потерян или не успел записаться
+        """
+        stats = await asyncio.to_thread(peer_stats.collect)
+        return public_key not in stats.index
+
+    async def resume(self, public_key: str) -> bool:
+        """Возвращает снятого пира на интерфейс. False - пир не был снят"""
+        if (
+            public_key not in self.suspended
+            and not await self._missing_from_runtime(public_key)
+        ):
+            return False
+        peer = await asyncio.to_thread(
+            get_wg_backend().peer_store.get, public_key
+        )
+        if peer is None and public_key not in self.suspended:
+            return False
+        if peer is not None:
+            await wg_queue.apply_runtime(
+                [PeerChange(public_key, peer.allowed_ips)]
+            )
+        self._resumed_at[public_key] = time.time()
+        if self.suspended.pop(public_key, None) is not None:
+            await self._save()
+        self.idle_peers = [
+            idle for idle in self.idle_peers if idle.public_key != public_key
+        ]
+        logger.info(f"Пир {public_key} возвращен на интерфейс")
+        return True
+
+    async def forget(self, public_keys: list[str]):
+        """Удаленные клиенты больше не отслеживаются"""
+        changed = False
+        for key in public_keys:
+            changed |= self.suspended.pop(key, None) is not None
+            self._first_seen.pop(key, None)
+            self._resumed_at.pop(key, None)
+        if changed:
+            await self._save()
+
+    async def run(self):
+        """Фоновая проверка неактивных пиров, запускается из lifespan"""
+        if self.timeout <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Ошибка проверки неактивных пиров: {e}")
+
+
+idle_peers = IdlePeerTracker()
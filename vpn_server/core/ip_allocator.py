@@ -0,0 +1,195 @@
+import logging
+import threading
+
+
+from array import array
+from ipaddress import IPv4Address, IPv4Network
+from typing import NamedTuple, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.models import IPAddress
+from database.repository import IPRepository
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+FULL_BYTE = 0xFF
+
+
+class AllocatedIP(NamedTuple):
+    id: int
+    address: str
+
+
+class IPAllocator:
+    """
+    Локальный аллокатор IP-адресов на битовой карте подсети.
+
+    Состояние загружается из ip_addresses один раз при старте, выделение и
+    освобождение адреса работают за O(1), изменения сразу пишутся в БД.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._first = 0
+        self._size = 0
+        # 1 бит на адрес: 1 - занят (или отсутствует в БД), 0 - свободен
+        self._bitmap = bytearray()
+        # id строки ip_addresses для каждого адреса подсети
+        self._ids = array('I')
+        # Индексы байтов карты, в которых есть хотя бы один свободный бит
+        self._free_bytes: set[int] = set()
+        self._free_count = 0
+
+    @property
+    def free_count(self) -> int:
+        return self._free_count
+
+    async def load(self, db: AsyncSession, subnet: str):
+        """Строит битовую карту по текущему состоянию таблицы ip_addresses"""
+        network = IPv4Network(subnet)
+        first = int(network.network_address)
+        size = network.num_addresses
+        if network.prefixlen < 31:
+            # Без адреса сети и broadcast, как в IPv4Network.hosts()
+            first += 1
+            size -= 2
+
+        bitmap = bytearray([FULL_BYTE]) * ((size + 7) // 8)
+        ids = array('I', bytes(4 * size))
+        free_count = 0
+
+        rows = await db.execute(
+            select(IPAddress.id, IPAddress.address, IPAddress.is_used)
+        )
+        for ip_id, address, is_used in rows:
+            idx = int(IPv4Address(address)) - first
+            if not 0 <= idx < size:
+                logger.warning(f"IP {address} вне подсети {subnet}, пропускаем")
+                continue
+            ids[idx] = ip_id
+            if not is_used:
+                bitmap[idx >> 3] &= ~(1 << (idx & 7))
+                free_count += 1
+
+        with self._lock:
+            self._first = first
+            self._size = size
+            self._bitmap = bitmap
+            self._ids = ids
+            self._free_bytes = {
+                i for i, byte in enumerate(bitmap) if byte != FULL_BYTE
+            }
+            self._free_count = free_count
+
+        logger.info(
+            f"Пул IP загружен: {free_count} свободных из {size} ({subnet})"
+        )
+
+    def _take(self) -> Optional[int]:
+        with self._lock:
+            if not self._free_bytes:
+                return None
+            byte_idx = self._free_bytes.pop()
+            byte = self._bitmap[byte_idx]
+            # Младший нулевой бит
+            bit = (~byte & (byte + 1)).bit_length() - 1
+            byte |= 1 << bit
+            self._bitmap[byte_idx] = byte
+            if byte != FULL_BYTE:
+                self._free_bytes.add(byte_idx)
+            self._free_count -= 1
+            return (byte_idx << 3) | bit
+
+    def _mark_used(self, idx: int):
+        with self._lock:
+            byte_idx = idx >> 3
+            mask = 1 << (idx & 7)
+            if self._bitmap[byte_idx] & mask:
+                return
+            self._bitmap[byte_idx] |= mask
+            if self._bitmap[byte_idx] == FULL_BYTE:
+                self._free_bytes.discard(byte_idx)
+            self._free_count -= 1
+
+    def _put(self, idx: int):
+        with self._lock:
+            byte_idx = idx >> 3
+            mask = 1 << (idx & 7)
+            if not self._bitmap[byte_idx] & mask:
+                return
+            self._bitmap[byte_idx] &= ~mask
+            self._free_bytes.add(byte_idx)
+            self._free_count += 1
+
+    def _index(self, address: str) -> Optional[int]:
+        idx = int(IPv4Address(address)) - self._first
+        if not 0 <= idx < self._size or not self._ids[idx]:
+            return None
+        return idx
+
+    async def allocate(
+        self, ip_repo: IPRepository, user_id: int, commit: bool = True
+    ) -> Optional[AllocatedIP]:
+        """
+        Выделяет свободный IP и атомарно фиксирует его в БД.
+        С commit=False резерв остается в текущей транзакции, при ее
+        откате адреса нужно вернуть через put_back().
+
+        Если адрес из карты уже занят в БД (например, другим воркером),
+        он остается помеченным как занятый и берется следующий. Когда карта
+        пуста, адрес резервируется напрямую в БД через SKIP LOCKED.
+        """
+        while True:
+            idx = self._take()
+            if idx is None:
+                break
+
+            ip_id = self._ids[idx]
+            try:
+                reserved = await ip_repo.reserve(ip_id, user_id, commit)
+            except Exception:
+                self._put(idx)
+                raise
+            if reserved:
+                return AllocatedIP(
+                    ip_id, str(IPv4Address(self._first + idx))
+                )
+            logger.warning(f"IP id={ip_id} уже занят в БД, берем следующий")
+
+        row = await ip_repo.reserve_free_ip(user_id, commit)
+        if not row:
+            return None
+        idx = self._index(row.address)
+        if idx is not None:
+            self._mark_used(idx)
+        return AllocatedIP(row.id, row.address)
+
+    def put_back(self, ips: list):
+        """
+        Возвращает адреса в карту без записи в БД: после отката резерва
+        или когда освобождение уже закоммичено вызывающим.
+        """
+        for ip in ips:
+            idx = self._index(ip.address)
+            if idx is not None:
+                self._put(idx)
+
+    def mark_used(self, ips: list):
+        """Помечает адреса занятыми в карте без записи в БД"""
+        for ip in ips:
+            idx = self._index(ip.address)
+            if idx is not None:
+                self._mark_used(idx)
+
+    async def free(self, ip_repo: IPRepository, ip: IPAddress):
+        """Освобождает IP в БД и возвращает его в битовую карту"""
+        await ip_repo.release(ip.id)
+        idx = self._index(ip.address)
+        if idx is not None:
+            self._put(idx)
+
+
+ip_allocator = IPAllocator()
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+
+
+from collections import deque
+from core.wg import get_wg_backend
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class KeyPool:
+    """
+    Пул заранее сгенерированных пар ключей WireGuard.
+
+    Фоновая задача держит в пуле до size пар и дозаполняет его, когда
+    остается меньше половины. При size = 0 или пустом пуле ключи
+    генерируются на месте.
+    """
+
+    def __init__(self, size: int = 0, chunk: int = 64):
+        self.size = size
+        self.chunk = chunk
+        self._keys: deque[tuple[str, str]] = deque()
+        self._refill = asyncio.Event()
+
+    def get(self) -> tuple[str, str]:
+        try:
+            keys = self._keys.popleft()
+        except IndexError:
+            keys = get_wg_backend().generate_keys()
+        if len(self._keys) < self.size // 2:
+            self._refill.set()
+        return keys
+
+    async def run(self):
+        """Фоновое дозаполнение пула, запускается из lifespan"""
+        if self.size <= 0:
+            return
+        logger.info(f"Пул ключей WireGuard: до {self.size} пар")
+        while True:
+            while len(self._keys) < self.size:
+                for _ in range(min(self.chunk, self.size - len(self._keys))):
+                    self._keys.append(get_wg_backend().generate_keys())
+                # Отдаем управление обработчикам между пачками
+                await asyncio.sleep(0)
+            self._refill.clear()
+            await self._refill.wait()
+
+
+key_pool = KeyPool()
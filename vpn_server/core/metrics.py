@@ -0,0 +1,79 @@
+import time
+import functools
+
+
+from contextlib import contextmanager
+from typing import NamedTuple
+from prometheus_client import Counter, Gauge, Histogram
+
+
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+REQUEST_SECONDS = Histogram(
+    'vpn_request_duration_seconds', 'Client API request duration',
+    ['endpoint'], buckets=BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    'vpn_request_stage_duration_seconds', 'Client API request stage duration',
+    ['endpoint', 'stage'], buckets=BUCKETS
+)
+REQUEST_FAILURES = Counter(
+    'vpn_request_failures', 'Client API request failures by stage',
+    ['endpoint', 'stage']
+)
+POOL_EXHAUSTED = Counter(
+    'vpn_ip_pool_exhausted', 'Config requests rejected for lack of free IPs'
+)
+FREE_IPS = Gauge('vpn_ip_pool_free', 'Free IP addresses in the pool')
+
+
+class ApplyTimings(NamedTuple):
+    """Длительность применения пачки изменений WireGuard, секунды"""
+    runtime: float
+    file_write: float
+
+
+def timed(endpoint: str):
+    """Общая длительность обработчика в REQUEST_SECONDS"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                REQUEST_SECONDS.labels(endpoint).observe(
+                    time.perf_counter() - start
+                )
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def stage(endpoint: str, name: str):
+    """Длительность этапа обработчика, исключение считается сбоем этапа"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        REQUEST_FAILURES.labels(endpoint, name).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(endpoint, name).observe(
+            time.perf_counter() - start
+        )
+
+
+def observe_wg_apply(endpoint: str, elapsed: float, timings: ApplyTimings):
+    """
+    Разбивает ожидание wg_queue на этапы: ожидание в очереди, wg set и
+    запись wg0.conf. Пачка общая, поэтому ее времена достаются каждому
+    запросу в ней.
+    """
+    queued = max(elapsed - timings.runtime - timings.file_write, 0.0)
+    STAGE_SECONDS.labels(endpoint, 'wg_queue').observe(queued)
+    STAGE_SECONDS.labels(endpoint, 'wg_apply').observe(timings.runtime)
+    STAGE_SECONDS.labels(endpoint, 'file_write').observe(timings.file_write)
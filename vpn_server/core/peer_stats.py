@@ -0,0 +1,95 @@
+import time
+import threading
+
+
+from array import array
+from typing import Optional
+from core.wg import get_wg_backend
+
+
+class PeerStats:
+    """
+    Снимок `wg show <iface> dump` в колоночном виде: i-й элемент каждого
+    массива относится к пиру keys[i]. Скорости считаются относительно
+    предыдущего снимка, для новых пиров и сброшенных счетчиков равны 0.
+    """
+
+    __slots__ = (
+        "taken_at", "keys", "endpoints", "index",
+        "latest_handshake", "rx_bytes", "tx_bytes", "rx_rate", "tx_rate",
+    )
+
+    def __init__(self, taken_at: float):
+        self.taken_at = taken_at
+        self.keys: list[str] = []
+        self.endpoints: list[str] = []
+        self.index: dict[str, int] = {}
+        self.latest_handshake = array('q')
+        self.rx_bytes = array('Q')
+        self.tx_bytes = array('Q')
+        self.rx_rate = array('d')
+        self.tx_rate = array('d')
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+def parse_dump(dump: str, taken_at: float) -> PeerStats:
+    """
+    Разбор вывода `wg show dump`. Первая строка - сам интерфейс, далее по
+    строке на пира: public-key, preshared-key, endpoint, allowed-ips,
+    latest-handshake, transfer-rx, transfer-tx, persistent-keepalive.
+    """
+    stats = PeerStats(taken_at)
+    lines = dump.splitlines()
+    for line in lines[1:]:
+        fields = line.split("\t")
+        if len(fields) < 8:
+            continue
+        stats.index[fields[0]] = len(stats.keys)
+        stats.keys.append(fields[0])
+        stats.endpoints.append(fields[2])
+        stats.latest_handshake.append(int(fields[4]))
+        stats.rx_bytes.append(int(fields[5]))
+        stats.tx_bytes.append(int(fields[6]))
+    return stats
+
+
+class PeerStatsCollector:
+    """
+    Периодические снимки статистики пиров. Снимки чаще min_interval
+    секунд не делаются: повторные вызовы получают последний снимок.
+    """
+
+    def __init__(self, min_interval: float = 1.0):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last: Optional[PeerStats] = None
+
+    def collect(self) -> PeerStats:
+        with self._lock:
+            now = time.time()
+            prev = self._last
+            if prev is not None and now - prev.taken_at < self.min_interval:
+                return prev
+
+            stats = parse_dump(get_wg_backend().dump(), now)
+            count = len(stats)
+            stats.rx_rate = array('d', bytes(8 * count))
+            stats.tx_rate = array('d', bytes(8 * count))
+            if prev is not None:
+                elapsed = now - prev.taken_at
+                for i, key in enumerate(stats.keys):
+                    j = prev.index.get(key)
+                    if j is None:
+                        continue
+                    rx = stats.rx_bytes[i] - prev.rx_bytes[j]
+                    tx = stats.tx_bytes[i] - prev.tx_bytes[j]
+                    stats.rx_rate[i] = rx / elapsed if rx > 0 else 0.0
+                    stats.tx_rate[i] = tx / elapsed if tx > 0 else 0.0
+
+            self._last = stats
+            return stats
+
+
+peer_stats = PeerStatsCollector()
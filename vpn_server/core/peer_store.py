@@ -0,0 +1,178 @@
+import os
+import logging
+import tempfile
+import threading
+
+
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Peer(NamedTuple):
+    public_key: str
+    allowed_ips: str
+
+
+class PeerChange(NamedTuple):
+    public_key: str
+    # None - удалить пира
+    allowed_ips: Optional[str] = None
+
+
+class PeerStore:
+    """
+    Индекс пиров конфига WireGuard: public key -> блок [Peer].
+
+    Поиск и удаление пира работают за O(1), любое изменение записывает
+    файл целиком одной последовательной записью во временный файл с
+    атомарной заменой (rename) под блокировкой. Если файл изменили извне,
+    индекс перечитывается при следующем обращении.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._interface: list[str] = []
+        self._peers: dict[str, list[str]] = {}
+        # (mtime_ns, size) файла после последнего чтения или записи
+        self._stamp: Optional[tuple[int, int]] = None
+
+    @staticmethod
+    def _peer_key(block: list[str]) -> Optional[str]:
+        for line in block:
+            key, sep, value = line.partition("=")
+            if sep and key.strip() == "PublicKey":
+                return value.strip()
+        return None
+
+    @staticmethod
+    def _peer_from_block(public_key: str, block: list[str]) -> Peer:
+        allowed_ips = ""
+        for line in block:
+            key, sep, value = line.partition("=")
+            if sep and key.strip() == "AllowedIPs":
+                allowed_ips = value.strip()
+        return Peer(public_key, allowed_ips)
+
+    def _load(self):
+        interface: list[str] = []
+        peers: dict[str, list[str]] = {}
+        block: Optional[list[str]] = None
+
+        def flush():
+            if block is None:
+                return
+            while block and not block[-1].strip():
+                block.pop()
+            public_key = self._peer_key(block)
+            if public_key is None:
+                logger.warning(f"Блок [Peer] без PublicKey в {self.path}")
+                return
+            peers[public_key] = block
+
+        for line in self.path.read_text().splitlines():
+            if line.strip() == "[Peer]":
+                flush()
+                block = [line]
+            elif block is not None:
+                block.append(line)
+            else:
+                interface.append(line)
+        flush()
+
+        while interface and not interface[-1].strip():
+            interface.pop()
+
+        self._interface = interface
+        self._peers = peers
+        self._stamp = self._file_stamp()
+
+    def _file_stamp(self) -> Optional[tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _ensure_loaded(self):
+        """Перечитывает файл, если он изменился с момента последней записи"""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        if stamp is None:
+            self._interface, self._peers, self._stamp = [], {}, None
+            return
+        self._load()
+
+    def _write(self):
+        parts = ["\n".join(self._interface)] if self._interface else []
+        parts.extend("\n".join(block) for block in self._peers.values())
+        content = "\n\n".join(parts) + "\n"
+
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.path.parent, prefix=f".{self.path.name}."
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            if self.path.exists():
+                os.chmod(tmp_path, self.path.stat().st_mode)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._stamp = self._file_stamp()
+
+    def get(self, public_key: str) -> Optional[Peer]:
+        with self._lock:
+            self._ensure_loaded()
+            block = self._peers.get(public_key)
+            if block is None:
+                return None
+            return self._peer_from_block(public_key, block)
+
+    def list_peers(self) -> list[Peer]:
+        with self._lock:
+            self._ensure_loaded()
+            return [
+                self._peer_from_block(public_key, block)
+                for public_key, block in self._peers.items()
+            ]
+
+    def add(self, public_key: str, allowed_ips: str):
+        """Добавляет или заменяет блок пира"""
+        self.apply([PeerChange(public_key, allowed_ips)])
+
+    def delete(self, public_key: str) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            if self._peers.pop(public_key, None) is None:
+                return False
+            self._write()
+            return True
+
+    def apply(self, changes: list[PeerChange]):
+        """Применяет пачку добавлений и удалений одной записью файла"""
+        with self._lock:
+            self._ensure_loaded()
+            changed = False
+            for change in changes:
+                if change.allowed_ips is None:
+                    if self._peers.pop(change.public_key, None) is not None:
+                        changed = True
+                else:
+                    self._peers[change.public_key] = [
+                        "[Peer]",
+                        f"PublicKey = {change.public_key}",
+                        f"AllowedIPs = {change.allowed_ips}",
+                    ]
+                    changed = True
+            if changed:
+                self._write()
@@ -0,0 +1,177 @@
+import time
+import asyncio
+import logging
+
+
+from typing import NamedTuple, Optional
+from database.database import SessionLocal
+from database.repository import IPRepository, ClientRepository
+from core.idle_peers import idle_peers
+from core.ip_allocator import AllocatedIP, ip_allocator
+from core.peer_store import PeerChange
+from core.startup import startup
+from core.wg import get_wg_backend
+from core.wg_queue import wg_queue
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ReconcileReport(NamedTuple):
+    started_at: float
+    duration: float
+    # Пиры в wg0 или wg0.conf без клиента в БД - удалены
+    orphan_peers: list[str]
+    # Клиенты без пира или с другим AllowedIPs - пиры добавлены заново
+    missing_peers: list[str]
+    # Занятые IP без клиента - освобождены
+    leaked_ips: list[str]
+    # IP клиента свободен в ip_addresses - помечен занятым
+    unmarked_ips: list[str]
+    # Расхождения первого прохода, ждут подтверждения
+    pending: int
+    error: Optional[str] = None
+
+
+class Reconciler:
+    """
+    Периодическая сверка четырех источников: clients, ip_addresses,
+    wg0.conf и runtime-пиров wg0. Пиры, снятые за неактивность, в runtime
+    не ожидаются. Каждый источник читается один раз в
+    словарь, расхождения считаются разностями множеств за O(n).
+
+    Расхождение исправляется, только если оно найдено два прохода подряд:
+    так не трогаются клиенты, которые прямо сейчас создаются или удаляются
+    обработчиками API.
+    """
+
+    def __init__(self, interval: float = 300.0):
+        self.interval = interval
+        self.last_report: Optional[ReconcileReport] = None
+        self._pending: dict[str, set] = {
+            "orphan_peers": set(),
+            "missing_peers": set(),
+            "leaked_ips": set(),
+            "unmarked_ips": set(),
+        }
+
+    def _confirm(self, kind: str, found: set) -> set:
+        """Оставляет расхождения, найденные и в прошлом проходе"""
+        confirmed = found & self._pending[kind]
+        self._pending[kind] = found - confirmed
+        return confirmed
+
+    @staticmethod
+    def _read_wg() -> tuple[dict[str, str], dict[str, str]]:
+        backend = get_wg_backend()
+        runtime = {
+            peer.public_key: peer.allowed_ips for peer in backend.list_peers()
+        }
+        stored = {
+            peer.public_key: peer.allowed_ips
+            for peer in backend.peer_store.list_peers()
+        }
+        return runtime, stored
+
+    async def reconcile(self) -> ReconcileReport:
+        started_at = time.time()
+        async with SessionLocal() as db:
+            ip_repo = IPRepository(db)
+            client_repo = ClientRepository(db)
+
+            clients = await client_repo.get_peer_addresses()
+            used_ips = await ip_repo.get_used()
+            runtime, stored = await asyncio.to_thread(self._read_wg)
+
+            expected = {
+                row.public_key: f"{row.address}/32"
+                for row in clients if row.address
+            }
+            referenced = {row.ip_id for row in clients}
+            client_ips = {
+                row.ip_id: row for row in clients
+                if row.address and not row.is_used
+            }
+
+            orphan_peers = self._confirm(
+                "orphan_peers", (runtime.keys() | stored.keys()) - expected.keys()
+            )
+            missing_peers = self._confirm(
+                "missing_peers",
+                {
+                    key for key, allowed_ips in expected.items()
+                    if stored.get(key) != allowed_ips
+                    or (
+                        runtime.get(key) != allowed_ips
+                        and key not in idle_peers.suspended
+                    )
+                }
+            )
+            leaked_ips = self._confirm(
+                "leaked_ips",
+                {row.id for row in used_ips if row.id not in referenced}
+            )
+            unmarked_ips = self._confirm("unmarked_ips", client_ips.keys())
+
+            # Пиры: одна пачка изменений через писателя wg_queue
+            changes = [PeerChange(key) for key in orphan_peers]
+            changes += [PeerChange(key, expected[key]) for key in missing_peers]
+            if changes:
+                await wg_queue.apply(changes)
+
+            # IP: освобождаем утекшие и занимаем адреса существующих клиентов
+            released = await ip_repo.release_unreferenced(
+                list(leaked_ips), commit=False
+            )
+            marked = []
+            for ip_id in unmarked_ips:
+                row = client_ips[ip_id]
+                if await ip_repo.reserve(ip_id, row.client_id, commit=False):
+                    marked.append(AllocatedIP(ip_id, row.address))
+            await db.commit()
+            ip_allocator.put_back(released)
+            ip_allocator.mark_used(marked)
+
+        self.last_report = ReconcileReport(
+            started_at=started_at,
+            duration=time.time() - started_at,
+            orphan_peers=sorted(orphan_peers),
+            missing_peers=sorted(missing_peers),
+            leaked_ips=sorted(row.address for row in released),
+            unmarked_ips=sorted(ip.address for ip in marked),
+            pending=sum(len(found) for found in self._pending.values()),
+        )
+        return self.last_report
+
+    async def run(self):
+        """Фоновый цикл сверки, запускается из lifespan"""
+        if self.interval <= 0:
+            return
+        await startup.wait_ready()
+        while True:
+            await asyncio.sleep(self.interval)
+            started_at = time.time()
+            try:
+                report = await self.reconcile()
+            except Exception as e:
+                logger.error(f"Ошибка сверки БД и WireGuard: {e}")
+                self.last_report = ReconcileReport(
+                    started_at, time.time() - started_at,
+                    [], [], [], [], 0, str(e)
+                )
+            else:
+                repaired = (
+                    len(report.orphan_peers) + len(report.missing_peers)
+                    + len(report.leaked_ips) + len(report.unmarked_ips)
+                )
+                if repaired:
+                    logger.warning(
+                        f"Сверка: удалено пиров {len(report.orphan_peers)}, "
+                        f"добавлено пиров {len(report.missing_peers)}, "
+                        f"освобождено IP {len(report.leaked_ips)}, "
+                        f"помечено IP {len(report.unmarked_ips)}"
+                    )
+
+
+reconciler = Reconciler()
@@ -0,0 +1,142 @@
+import json
+import time
+import base64
+import asyncio
+import logging
+
+
+import httpx
+
+
+from typing import Optional
+from core.startup import startup
+from utils.backoff import backoff_delay
+from utils.env_manager import update_env_var
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def token_expires_at(token: str) -> Optional[float]:
+    """Поле exp из payload JWT без проверки подписи"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+    except (IndexError, ValueError):
+        return None
+    return float(exp) if exp is not None else None
+
+
+class Registration:
+    """
+    Регистрация ноды на main_server в фоне.
+
+    Неудачные попытки повторяются с экспоненциальной задержкой. Полученный
+    JWT перевыпускается заранее, за refresh_margin секунд до истечения
+    (но не раньше середины срока), или сразу после invalidate(), если
+    шлюз перестал принимать токен.
+    """
+
+    def __init__(self, refresh_margin: float = 300.0, timeout: float = 10.0):
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+        self.token: Optional[str] = None
+        self.expires_at: Optional[float] = None
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.registered = asyncio.Event()
+        self._refresh = asyncio.Event()
+
+    @property
+    def state(self) -> str:
+        if self.token is None:
+            return "pending"
+        if self.expires_at is not None and self.expires_at <= time.time():
+            return "expired"
+        return "registered"
+
+    def invalidate(self):
+        """Перевыпустить токен, не дожидаясь срока"""
+        self._refresh.set()
+
+    async def register(self, client: httpx.AsyncClient) -> str:
+        from main_vpn import (
+            COUNTRY,
+            SERVER_ID,
+            NAME,
+            MAX_COUNT_USERS,
+            MAIN_SERVER,
+            SERVER_ENDPOINT,
+            REG_TOKEN
+        )
+
+        server_data = {
+            "server_id": int(SERVER_ID),
+            "ip": SERVER_ENDPOINT,
+            'name': NAME,
+            "country": COUNTRY,
+            "max_count_users": int(MAX_COUNT_USERS),
+        }
+
+        response = await client.post(
+            f'http://{MAIN_SERVER}/auth/register/',
+            headers={
+                "authorization": f"Bearer {REG_TOKEN}"
+            },
+            json=server_data,
+        )
+        response.raise_for_status()
+        token = response.json().get("token")
+        if not token:
+            raise ValueError("main_server не вернул токен")
+        return token
+
+    def _refresh_delay(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        left = self.expires_at - time.time()
+        return max(left - self.refresh_margin, left / 2, 0.0)
+
+    async def run(self):
+        """Фоновая регистрация и обновление токена, запускается из lifespan"""
+        # Шлюз начнет слать клиентов сразу после регистрации: регистрируемся
+        # только готовой нодой
+        await startup.wait_ready()
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            while True:
+                self.attempts += 1
+                try:
+                    token = await self.register(client)
+                except Exception as e:
+                    self.last_error = str(e)
+                    delay = backoff_delay(self.attempts)
+                    logger.warning(
+                        f"Регистрация на main_server не удалась "
+                        f"(попытка {self.attempts}): {e}, "
+                        f"повтор через {delay:.1f} с"
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+
+                self.token = token
+                self.expires_at = token_expires_at(token)
+                self.attempts = 0
+                self.last_error = None
+                self._refresh.clear()
+                self.registered.set()
+                await asyncio.to_thread(
+                    update_env_var, key='SERVER_JWT_TOKEN', value=token
+                )
+                logger.info("Сервер зарегистрирован на main_server")
+
+                try:
+                    await asyncio.wait_for(
+                        self._refresh.wait(), self._refresh_delay()
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+
+registration = Registration()
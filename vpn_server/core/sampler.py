@@ -0,0 +1,106 @@
+import time
+import asyncio
+import logging
+
+
+import psutil
+
+
+from collections import deque
+from typing import NamedTuple, Optional
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Sample(NamedTuple):
+    taken_at: float
+    cpu: float
+    memory: float
+    # Байт в секунду с предыдущего замера
+    sent_per_sec: float
+    recv_per_sec: float
+
+
+MB = 1024 * 1024
+
+
+def sample_to_dict(sample: Sample) -> dict:
+    """Замер в формате /status: трафик в МБ/с"""
+    return {
+        "cpu": sample.cpu,
+        "memory": sample.memory,
+        "sent_traffic": sample.sent_per_sec / MB,
+        "recv_traffic": sample.recv_per_sec / MB,
+    }
+
+
+class SystemSampler:
+    """
+    Фоновый сбор CPU, памяти и сетевого трафика с фиксированным шагом.
+    Замеры хранятся в буфере за последние window секунд (обрезается по
+    времени замера, поэтому не зависит от interval), /status и /metrics
+    читают готовые значения и не блокируют event loop.
+    """
+
+    def __init__(self, interval: float = 5.0, window: float = 300.0):
+        self.interval = interval
+        self.window = window
+        self._samples: deque[Sample] = deque()
+        self._prev_net = None
+        self._prev_time = 0.0
+
+    def sample(self) -> Sample:
+        now = time.time()
+        net = psutil.net_io_counters()
+        sent_per_sec = recv_per_sec = 0.0
+        if self._prev_net is not None and now > self._prev_time:
+            elapsed = now - self._prev_time
+            sent_per_sec = (net.bytes_sent - self._prev_net.bytes_sent) / elapsed
+            recv_per_sec = (net.bytes_recv - self._prev_net.bytes_recv) / elapsed
+        self._prev_net = net
+        self._prev_time = now
+
+        sample = Sample(
+            taken_at=now,
+            # CPU с момента предыдущего вызова, без ожидания
+            cpu=psutil.cpu_percent(interval=None),
+            memory=psutil.virtual_memory().percent,
+            sent_per_sec=sent_per_sec,
+            recv_per_sec=recv_per_sec,
+        )
+        self._samples.append(sample)
+        while self._samples[0].taken_at < now - self.window:
+            self._samples.popleft()
+        return sample
+
+    def latest(self) -> Optional[Sample]:
+        return self._samples[-1] if self._samples else None
+
+    def average(self, seconds: float) -> Optional[Sample]:
+        """Среднее по замерам за последние seconds секунд"""
+        if not self._samples:
+            return None
+        since = self._samples[-1].taken_at - seconds
+        samples = [s for s in self._samples if s.taken_at >= since]
+        count = len(samples)
+        return Sample(
+            taken_at=samples[-1].taken_at,
+            cpu=sum(s.cpu for s in samples) / count,
+            memory=sum(s.memory for s in samples) / count,
+            sent_per_sec=sum(s.sent_per_sec for s in samples) / count,
+            recv_per_sec=sum(s.recv_per_sec for s in samples) / count,
+        )
+
+    async def run(self):
+        """Фоновый цикл замеров, запускается из lifespan"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Ошибка замера системных метрик: {e}")
+
+
+system_sampler = SystemSampler()
@@ -0,0 +1,65 @@
+import time
+import asyncio
+import logging
+
+
+from typing import Awaitable, Callable, Optional
+from utils.backoff import backoff_delay
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    """
+    Готовность ноды. Подготовка (схема БД, пул IP, аллокатор) выполняется
+    в фоне после запуска сервера и повторяется с экспоненциальной
+    задержкой, пока не пройдет. До этого клиентское API отвечает 503.
+    """
+
+    def __init__(self):
+        # Отсчет с импорта модуля, то есть почти с запуска процесса
+        self.started_at = time.perf_counter()
+        self.serving_after: Optional[float] = None
+        self.ready_after: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._ready = asyncio.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def serving(self):
+        """Отметка: lifespan завершен, сервер принимает запросы"""
+        self.serving_after = time.perf_counter() - self.started_at
+        logger.info(f"Сервер принимает запросы через {self.serving_after:.3f} с")
+
+    async def wait_ready(self):
+        await self._ready.wait()
+
+    async def run(self, prepare: Callable[[], Awaitable[None]]):
+        """Фоновая подготовка ноды, запускается из lifespan"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                await prepare()
+            except Exception as e:
+                self.last_error = str(e)
+                delay = backoff_delay(attempt, cap=60.0)
+                logger.error(
+                    f"Ошибка подготовки ноды (попытка {attempt}): {e}, "
+                    f"повтор через {delay:.1f} с"
+                )
+                await asyncio.sleep(delay)
+                continue
+            break
+
+        self.last_error = None
+        self.ready_after = time.perf_counter() - self.started_at
+        self._ready.set()
+        logger.info(f"Нода готова через {self.ready_after:.3f} с после старта")
+
+
+startup = Startup()
@@ -1,95 +1,211 @@
+import os
+import base64
+import logging
+import time
+import tempfile
+import threading
 import subprocess
 from pathlib import Path
+from typing import Optional
+
+
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from core.metrics import ApplyTimings
+from core.peer_store import Peer, PeerChange, PeerStore
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+WG_INTERFACE = "wg0"
+WG_CONFIG_PATH = Path("/etc/wireguard/wg0.conf")
 
 
 def generate_keys() -> tuple[str, str]:
-    private_key = subprocess.run(
-        ["wg", "genkey"],
-        capture_output=True,
-        text=True
-    ).stdout.strip()
-    public_key = subprocess.run(
-        ["wg", "pubkey"],
-        input=private_key,
-        capture_output=True,
-        text=True
-    ).stdout.strip()
-    return private_key, public_key
-
-
-def add_client_to_server_config(client_public_key: str, client_ip: str):
-    peer_config = (
-        f"\n[Peer]\n"
-        f"PublicKey = {client_public_key}\n"
-        f"AllowedIPs = {client_ip}/32\n"
+    """Пара ключей WireGuard без вызова wg genkey / wg pubkey"""
+    private_bytes = bytearray(os.urandom(32))
+    # Клэмпинг как в wg genkey
+    private_bytes[0] &= 248
+    private_bytes[31] = (private_bytes[31] & 127) | 64
+    public_bytes = (
+        X25519PrivateKey.from_private_bytes(bytes(private_bytes))
+        .public_key()
+        .public_bytes(Encoding.Raw, PublicFormat.Raw)
     )
-    with open("/etc/wireguard/wg0.conf", "a") as f:
-        f.write(peer_config)
-    command = "sudo bash -c 'wg syncconf wg0 <(wg-quick strip wg0)'"
-    result = subprocess.run(
-        command,
-        shell=True,
-        capture_output=True,
-        text=True
+    return (
+        base64.b64encode(private_bytes).decode(),
+        base64.b64encode(public_bytes).decode(),
     )
-    if result.returncode != 0:
-        raise subprocess.CalledProcessError(result.returncode, result.args)
 
 
-def delete_client_from_server_config(client_public_key: str):
-    """Полное удаление пира из конфига и runtime"""
-    config_path = Path("/etc/wireguard/wg0.conf")
+def coalesce_changes(changes: list[PeerChange]) -> list[PeerChange]:
+    """Для одного ключа остается только последнее изменение"""
+    return list({change.public_key: change for change in changes}.values())
+
+
+class WGBackend:
+    """
+    Интерфейс управления WireGuard на ноде: ключи, пиры и статистика.
+    Конфиг-файл ведется через PeerStore, runtime - реализацией.
+    """
+
+    name = None
+
+    def __init__(self, peer_store: PeerStore):
+        self.peer_store = peer_store
+
+    def generate_keys(self) -> tuple[str, str]:
+        return generate_keys()
+
+    def apply_peers(self, changes: list[PeerChange]) -> ApplyTimings:
+        """
+        Применяет пачку изменений пиров: одно обновление runtime и
+        одна запись конфиг-файла.
+        """
+        net_changes = coalesce_changes(changes)
+        if not net_changes:
+            return ApplyTimings(0.0, 0.0)
+        start = time.perf_counter()
+        self._apply_runtime(net_changes)
+        applied = time.perf_counter()
+        self.peer_store.apply(net_changes)
+        return ApplyTimings(applied - start, time.perf_counter() - applied)
+
+    def apply_runtime(self, changes: list[PeerChange]):
+        """
+        Изменяет только runtime, конфиг-файл не трогает: для временного
+        снятия пиров с интерфейса.
+        """
+        net_changes = coalesce_changes(changes)
+        if net_changes:
+            self._apply_runtime(net_changes)
+
+    def list_peers(self) -> list[Peer]:
+        """Пиры, активные в runtime"""
+        raise NotImplementedError
+
+    def dump(self) -> str:
+        """Вывод в формате `wg show <iface> dump`"""
+        raise NotImplementedError
+
+    def _apply_runtime(self, changes: list[PeerChange]):
+        raise NotImplementedError
+
+
+class WGToolsBackend(WGBackend):
+    """Реальный интерфейс через утилиту wg"""
+
+    name = "wg"
 
-    # Шаг 1: Удаление из runtime-конфигурации
-    try:
-        subprocess.run(
-            ["sudo", "wg", "set", "wg0", "peer", client_public_key, "remove"],
+    def __init__(
+        self,
+        interface: str = WG_INTERFACE,
+        config_path: Path = WG_CONFIG_PATH
+    ):
+        super().__init__(PeerStore(config_path))
+        self.interface = interface
+
+    def _apply_runtime(self, changes: list[PeerChange]):
+        # Одна команда wg set только для затронутых пиров
+        command = ["sudo", "wg", "set", self.interface]
+        for change in changes:
+            command += ["peer", change.public_key]
+            if change.allowed_ips is None:
+                command.append("remove")
+            else:
+                command += ["allowed-ips", change.allowed_ips]
+
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            only_removes = all(c.allowed_ips is None for c in changes)
+            if not (only_removes and "No such peer" in result.stderr):
+                raise subprocess.CalledProcessError(
+                    result.returncode, result.args,
+                    result.stdout, result.stderr
+                )
+
+    def _show(self, *args: str) -> str:
+        return subprocess.run(
+            ["sudo", "wg", "show", self.interface, *args],
             check=True,
             capture_output=True,
             text=True
-        )
-    except subprocess.CalledProcessError as e:
-        if "No such peer" not in e.stderr:
-            raise RuntimeError(f"Ошибка удаления из runtime: {e.stderr}")
-
-    # Шаг 2: Удаление из конфиг-файла
-    config_content = config_path.read_text().splitlines()
-    new_content = []
-    peer_block = []
-    in_target_peer = False
-
-    for line in config_content:
-        if line.strip() == "[Peer]":
-            if peer_block:
-                if not in_target_peer:
-                    new_content.extend(peer_block)
-                peer_block = []
-            in_target_peer = False
-            peer_block.append(line)
-        elif peer_block:
-            peer_block.append(line)
-            if line.strip().startswith("PublicKey ="):
-                current_key = line.split("=", 1)[1].strip()
-                if current_key == client_public_key:
-                    in_target_peer = True
-        else:
-            new_content.append(line)
+        ).stdout
 
-    # Добавляем последний блок, если не целевой
-    if peer_block and not in_target_peer:
-        new_content.extend(peer_block)
+    def list_peers(self) -> list[Peer]:
+        peers = []
+        for line in self._show("allowed-ips").splitlines():
+            public_key, _, allowed_ips = line.partition("\t")
+            if public_key:
+                peers.append(Peer(public_key, allowed_ips.replace(" ", ",")))
+        return peers
 
-    # Запись нового конфига
-    config_path.write_text("\n".join(new_content) + "\n")
+    def dump(self) -> str:
+        return self._show("dump")
 
-    # Шаг 3: Принудительная синхронизация
-    command = "sudo bash -c 'wg syncconf wg0 <(wg-quick strip wg0)'"
-    result = subprocess.run(
-            command,
-            shell=True,
-            capture_output=True,
-            text=True
+
+class FakeWGBackend(WGBackend):
+    """
+    Интерфейс в памяти для нагрузочного тестирования без root и wg:
+    runtime хранится в словаре, конфиг пишется во временный каталог.
+    """
+
+    name = "fake"
+
+    def __init__(self, config_dir: Optional[str] = None):
+        config_dir = Path(
+            config_dir or tempfile.mkdtemp(prefix="wg-fake-")
         )
+        config_dir.mkdir(parents=True, exist_ok=True)
+        config_path = config_dir / f"{WG_INTERFACE}.conf"
+        if not config_path.exists():
+            config_path.write_text("[Interface]\n")
+        super().__init__(PeerStore(config_path))
+        self._lock = threading.Lock()
+        self._private_key, self._public_key = generate_keys()
+        self._runtime: dict[str, str] = {
+            peer.public_key: peer.allowed_ips
+            for peer in self.peer_store.list_peers()
+        }
+        logger.info(f"Fake WireGuard backend: {config_path}")
+
+    def _apply_runtime(self, changes: list[PeerChange]):
+        with self._lock:
+            for change in changes:
+                if change.allowed_ips is None:
+                    self._runtime.pop(change.public_key, None)
+                else:
+                    self._runtime[change.public_key] = change.allowed_ips
+
+    def list_peers(self) -> list[Peer]:
+        with self._lock:
+            return [Peer(key, ips) for key, ips in self._runtime.items()]
+
+    def dump(self) -> str:
+        with self._lock:
+            lines = [f"{self._private_key}\t{self._public_key}\t8080\toff"]
+            lines.extend(
+                f"{key}\t(none)\t(none)\t{ips}\t0\t0\t0\toff"
+                for key, ips in self._runtime.items()
+            )
+        return "\n".join(lines) + "\n"
+
 
-    if result.returncode != 0:
-        raise subprocess.CalledProcessError(result.returncode, result.args)
+_wg_backend: Optional[WGBackend] = None
+
+
+def get_wg_backend() -> WGBackend:
+    """Backend выбирается переменной окружения WG_BACKEND (wg | fake)"""
+    global _wg_backend
+    if _wg_backend is None:
+        from main_vpn import WG_BACKEND, WG_FAKE_DIR
+
+        if WG_BACKEND == WGToolsBackend.name:
+            _wg_backend = WGToolsBackend()
+        elif WG_BACKEND == FakeWGBackend.name:
+            _wg_backend = FakeWGBackend(WG_FAKE_DIR)
+        else:
+            raise ValueError(f"Неизвестный WG_BACKEND: {WG_BACKEND}")
+    return _wg_backend
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+
+
+from concurrent.futures import ThreadPoolExecutor
+
+from core.metrics import ApplyTimings
+from core.peer_store import PeerChange
+from core.wg import get_wg_backend
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PeerMutationQueue:
+    """
+    Единственный писатель изменений WireGuard на ноде.
+
+    Все добавления и удаления пиров, пришедшие в течение window секунд,
+    применяются одной записью wg0.conf и одной командой wg set. Каждый
+    вызывающий получает свой результат: если общая пачка не применилась,
+    изменения применяются по отдельности, и ошибка достается только тому,
+    чье изменение упало. Результат - длительности этапов пачки.
+    """
+
+    def __init__(self, window: float = 0.005, max_batch: int = 1000):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue[
+            tuple[list[PeerChange], asyncio.Future]
+        ] = asyncio.Queue()
+        # Отдельный поток писателя, чтобы wg и запись файла не блокировали
+        # event loop и не конкурировали с остальными блокирующими вызовами
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="wg-writer"
+        )
+
+    async def apply(self, changes: list[PeerChange]) -> ApplyTimings:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((changes, future))
+        return await future
+
+    async def add_peer(self, public_key: str, client_ip: str) -> ApplyTimings:
+        return await self.apply([PeerChange(public_key, f"{client_ip}/32")])
+
+    async def remove_peer(self, public_key: str) -> ApplyTimings:
+        return await self.apply([PeerChange(public_key)])
+
+    async def apply_runtime(self, changes: list[PeerChange]):
+        """
+        Изменение только runtime, без записи wg0.conf. Выполняется в потоке
+        писателя вне пачек, поэтому не пересекается с их применением.
+        """
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, get_wg_backend().apply_runtime, changes
+        )
+
+    async def _collect(self) -> list[tuple[list[PeerChange], asyncio.Future]]:
+        batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while size < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def _apply_changes(self, changes: list[PeerChange]) -> ApplyTimings:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, get_wg_backend().apply_peers, changes
+        )
+
+    async def _apply_one(
+        self, changes: list[PeerChange], future: asyncio.Future
+    ):
+        try:
+            timings = await self._apply_changes(changes)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(timings)
+
+    async def run(self):
+        """Фоновый цикл писателя, запускается из lifespan"""
+        while True:
+            batch = await self._collect()
+            changes = [change for item, _ in batch for change in item]
+            try:
+                timings = await self._apply_changes(changes)
+            except Exception as e:
+                if len(batch) == 1:
+                    _, future = batch[0]
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                logger.warning(
+                    f"Пачка из {len(batch)} изменений не применилась "
+                    f"({e}), применяем по одному"
+                )
+                for item, future in batch:
+                    await self._apply_one(item, future)
+                continue
+
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(timings)
+
+
+wg_queue = PeerMutationQueue()
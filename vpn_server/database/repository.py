@@ -1,7 +1,11 @@
 import logging
 
 
-from sqlalchemy.orm import Session
+from ipaddress import IPv4Network
+from itertools import islice
+from sqlalchemy import Row, delete, exists, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from .models import IPAddress, Clients
 
@@ -13,41 +17,42 @@ logger = logging.getLogger(__name__)
 class BaseRepository:
     model = None
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def get_by_id(self, obj_id: int):
-        return self.db.query(self.model).filter(self.model.id == obj_id).first()
+    async def get_by_id(self, obj_id: int):
+        return await self.db.get(self.model, obj_id)
 
-    def get_all(self):
-        return self.db.query(self.model).all()
+    async def get_all(self):
+        result = await self.db.scalars(select(self.model))
+        return result.all()
 
-    def create(self, **kwargs):
+    async def create(self, **kwargs):
         obj = self.model(**kwargs)
         self.db.add(obj)
-        self.db.commit()
-        self.db.refresh(obj)
+        await self.db.commit()
+        await self.db.refresh(obj)
         logger.info(f"[{self.__class__.__name__}] Created: {obj.id}")
         return obj
 
-    def update(self, obj_id: int, **kwargs):
-        obj = self.get_by_id(obj_id)
+    async def update(self, obj_id: int, **kwargs):
+        obj = await self.get_by_id(obj_id)
         if not obj:
             logger.warning(f"[{self.__class__.__name__}] Not found for update: {obj_id}")
             return None
         for key, value in kwargs.items():
             setattr(obj, key, value)
-        self.db.commit()
+        await self.db.commit()
         logger.info(f"[{self.__class__.__name__}] Updated: {obj.id}")
         return obj
 
-    def delete(self, obj_id: int):
-        obj = self.get_by_id(obj_id)
+    async def delete(self, obj_id: int):
+        obj = await self.get_by_id(obj_id)
         if not obj:
             logger.warning(f"[{self.__class__.__name__}] Not found for delete: {obj_id}")
             return False
-        self.db.delete(obj)
-        self.db.commit()
+        await self.db.delete(obj)
+        await self.db.commit()
         logger.info(f"[{self.__class__.__name__}] Deleted: {obj.id}")
         return True
 
@@ -55,62 +60,227 @@ class BaseRepository:
 class IPRepository(BaseRepository):
     model = IPAddress
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def get_free_ip(self) -> Optional[IPAddress]:
-        return (
-            self.db.query(self.model)
-            .filter(self.model.is_used.is_(False))
-            .first()
+    async def reserve(
+        self, ip_id: int, user_id: int, commit: bool = True
+    ) -> bool:
+        """
+        Атомарно занимает конкретный IP. Возвращает False, если адрес
+        уже занят другим запросом или процессом.
+        """
+        result = await self.db.execute(
+            update(self.model)
+            .where(self.model.id == ip_id, self.model.is_used.is_(False))
+            .values(is_used=True, client_id=user_id)
         )
+        if commit:
+            await self.db.commit()
+        return result.rowcount == 1
 
-    def mark_ip_used(self, ip: IPAddress, user_id: int):
-        ip.is_used = True
-        ip.client_id = user_id
-        self.db.commit()
-        self.db.refresh(ip)
-        return ip
+    async def reserve_free_ip(
+        self, user_id: int, commit: bool = True
+    ) -> Optional[Row]:
+        """
+        Атомарно занимает любой свободный IP одним запросом
+        UPDATE ... RETURNING. Строки, заблокированные параллельными
+        транзакциями, пропускаются (SKIP LOCKED).
+        """
+        free_id = (
+            select(self.model.id)
+            .where(self.model.is_used.is_(False))
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await self.db.execute(
+            update(self.model)
+            .where(self.model.id == free_id)
+            .values(is_used=True, client_id=user_id)
+            .returning(self.model.id, self.model.address)
+        )
+        row = result.first()
+        if commit:
+            await self.db.commit()
+        return row
+
+    async def release(self, ip_id: int, commit: bool = True):
+        await self.release_many([ip_id], commit)
 
-    def free_ip(self, ip: IPAddress):
+    async def free_ip(self, ip: IPAddress):
         ip.is_used = False
         ip.client_id = 0
-        self.db.commit()
-        self.db.refresh(ip)
+        await self.db.commit()
+        await self.db.refresh(ip)
         return ip
 
-    def get_by_address_and_client(
+    async def get_by_ids(self, ip_ids: list[int]) -> list[IPAddress]:
+        if not ip_ids:
+            return []
+        result = await self.db.scalars(
+            select(self.model).where(self.model.id.in_(ip_ids))
+        )
+        return list(result.all())
+
+    async def release_many(self, ip_ids: list[int], commit: bool = True):
+        await self.db.execute(
+            update(self.model)
+            .where(self.model.id.in_(ip_ids))
+            .values(is_used=False, client_id=0)
+        )
+        if commit:
+            await self.db.commit()
+
+    async def get_used(self) -> list[Row]:
+        """(id, address) всех занятых IP"""
+        result = await self.db.execute(
+            select(self.model.id, self.model.address)
+            .where(self.model.is_used.is_(True))
+        )
+        return list(result.all())
+
+    async def release_unreferenced(
+        self, ip_ids: list[int], commit: bool = True
+    ) -> list[Row]:
+        """
+        Освобождает IP из ip_ids, на которые не ссылается ни один клиент.
+        Возвращает (id, address) освобожденных адресов.
+        """
+        if not ip_ids:
+            return []
+        result = await self.db.execute(
+            update(self.model)
+            .where(
+                self.model.id.in_(ip_ids),
+                self.model.is_used.is_(True),
+                ~exists().where(Clients.ip_address == self.model.id)
+            )
+            .values(is_used=False, client_id=0)
+            .returning(self.model.id, self.model.address)
+        )
+        rows = list(result.all())
+        if commit:
+            await self.db.commit()
+        return rows
+
+    async def get_by_address_and_client(
         self, address: str, client_id: int
     ) -> Optional[IPAddress]:
-        return self.db.query(self.model).filter(
-            self.model.address == address,
-            self.model.client_id == client_id
-        ).first()
+        return await self.db.scalar(
+            select(self.model).where(
+                self.model.address == address,
+                self.model.client_id == client_id
+            )
+        )
+
+    async def init_ip_pool(self, subnet: str, chunk_size: int = 5000):
+        """
+        Досоздает недостающие адреса подсети пачками по chunk_size.
+        Уже существующие адреса не трогает, поэтому пул можно расширить,
+        просто увеличив подсеть.
+        """
+        network = IPv4Network(subnet)
+        hosts_count = network.num_addresses
+        if network.prefixlen < 31:
+            hosts_count -= 2
 
-    def init_ip_pool(self, subnet: str):
-        from ipaddress import IPv4Network
-        if self.db.query(self.model).count() == 0:
-            network = IPv4Network(subnet)
-            for ip in network.hosts():
-                self.db.add(self.model(address=str(ip), is_used=False))
-            self.db.commit()
+        existing = await self.db.scalar(select(func.count(self.model.id)))
+        if existing >= hosts_count:
+            return
+
+        hosts = network.hosts()
+        while True:
+            chunk = [
+                {"address": str(ip), "is_used": False, "client_id": 0}
+                for ip in islice(hosts, chunk_size)
+            ]
+            if not chunk:
+                break
+            await self.db.execute(
+                insert(self.model)
+                .on_conflict_do_nothing(index_elements=["address"]),
+                chunk
+            )
+        await self.db.commit()
+        logger.info(
+            f"[{self.__class__.__name__}] Pool {subnet}: "
+            f"{existing} -> {hosts_count}"
+        )
 
 
 class ClientRepository(BaseRepository):
     model = Clients
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def get_by_id_and_name(
+    async def get_by_id_and_name(
         self, client_id: int, config_name: str
     ) -> Optional[Clients]:
-        return self.db.query(self.model).filter(
-            self.model.client_id == client_id,
-            self.model.config_name == config_name
-        ).first()
+        return await self.db.scalar(
+            select(self.model).where(
+                self.model.client_id == client_id,
+                self.model.config_name == config_name
+            )
+        )
+
+    async def get_with_address(
+        self, client_id: int, config_name: str
+    ) -> Optional[Row]:
+        """Клиент вместе с его IP-адресом одним запросом"""
+        result = await self.db.execute(
+            select(self.model, IPAddress.address)
+            .join(IPAddress, IPAddress.id == self.model.ip_address)
+            .where(
+                self.model.client_id == client_id,
+                self.model.config_name == config_name
+            )
+        )
+        return result.first()
+
+    async def get_peer_index(self) -> dict[str, Row]:
+        """public key -> (client_id, config_name) по всем клиентам"""
+        result = await self.db.execute(
+            select(
+                self.model.public_key,
+                self.model.client_id,
+                self.model.config_name
+            )
+        )
+        return {row.public_key: row for row in result}
 
-    def create(
+    async def get_peer_addresses(self) -> list[Row]:
+        """
+        (public_key, client_id, ip_id, address, is_used) по всем клиентам.
+        address равен None, если строки IP нет.
+        """
+        result = await self.db.execute(
+            select(
+                self.model.public_key,
+                self.model.client_id,
+                self.model.ip_address.label("ip_id"),
+                IPAddress.address,
+                IPAddress.is_used
+            )
+            .outerjoin(IPAddress, IPAddress.id == self.model.ip_address)
+        )
+        return list(result.all())
+
+    async def get_by_ids_and_names(
+        self, pairs: list[tuple[int, str]]
+    ) -> list[Clients]:
+        if not pairs:
+            return []
+        result = await self.db.scalars(
+            select(self.model).where(
+                tuple_(self.model.client_id, self.model.config_name)
+                .in_(pairs)
+            )
+        )
+        return list(result.all())
+
+    async def create(
         self,
         client_id: int,
         private_key: str,
@@ -126,10 +296,35 @@ class ClientRepository(BaseRepository):
             config_name=config_name,
         )
         self.db.add(client)
-        self.db.commit()
-        self.db.refresh(client)
+        await self.db.commit()
+        await self.db.refresh(client)
         return client
 
-    def delete(self, client: Clients):
-        self.db.delete(client)
-        self.db.commit()
+    async def create_many(self, clients: list[dict]) -> list[Clients]:
+        """Создает клиентов одной транзакцией вместе с ранее занятыми IP"""
+        objs = [
+            Clients(
+                client_id=client["client_id"],
+                privat_key=client["private_key"],
+                public_key=client["public_key"],
+                ip_address=client["ip_address"],
+                config_name=client["config_name"],
+            )
+            for client in clients
+        ]
+        self.db.add_all(objs)
+        await self.db.commit()
+        logger.info(f"[{self.__class__.__name__}] Created: {len(objs)}")
+        return objs
+
+    async def delete(self, client: Clients):
+        await self.db.delete(client)
+        await self.db.commit()
+
+    async def delete_many(self, clients: list[Clients]):
+        await self.db.execute(
+            delete(self.model)
+            .where(self.model.id.in_([client.id for client in clients]))
+        )
+        await self.db.commit()
+        logger.info(f"[{self.__class__.__name__}] Deleted: {len(clients)}")
@@ -1,10 +1,12 @@
-from fastapi import Depends
+from fastapi import Depends, HTTPException
 from database.database import get_db
 
 from database.repository import (
     IPRepository,
     ClientRepository,
 )
+from core.ip_allocator import ip_allocator
+from core.startup import startup
 
 
 def get_ip_repository(db=Depends(get_db)):
@@ -19,3 +21,18 @@ def get_client_repository(db=Depends(get_db)):
     Dependency to get ClientRepository instance.
     """
     return ClientRepository(db)
+
+
+def get_ip_allocator():
+    """
+    Dependency to get the node-local IPAllocator.
+    """
+    return ip_allocator
+
+
+def require_ready():
+    """
+    Dependency that rejects requests until the node has finished startup.
+    """
+    if not startup.ready:
+        raise HTTPException(503, "Сервер еще не готов")
@@ -1,28 +1,37 @@
 import os
+import asyncio
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from dotenv import load_dotenv
-from pathlib import Path
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 
-from database.database import Base, engine, get_db
-from core.ip_pool import init_ip_pool, register_server
+from database.database import Base, engine, SessionLocal
+from core.ip_pool import init_ip_pool
+from core.ip_allocator import ip_allocator
+from core.key_pool import key_pool
+from core.wg import get_wg_backend
+from core.wg_queue import wg_queue
+from core.sampler import system_sampler
+from core.reconciler import reconciler
+from core.idle_peers import idle_peers
+from core.heartbeat import heartbeat_sender
+from core.registration import registration
+from core.startup import startup
+from dependencies import require_ready
 from api.client import router as client_router
 from api.status import router as status_router
 from api.metrics import router as metrics_router
+from api.peers import router as peers_router
 
 
 load_dotenv()
 
-
-CONFIGS_DIR = Path("./configs")
-CONFIGS_DIR.mkdir(exist_ok=True)
-
 # Конфигурация сервера
 SERVER_PUBLIC_KEY = os.getenv('SERVER_PUBLIC_KEY')
 SERVER_ENDPOINT = os.getenv('SERVER_ENDPOINT')
-SERVER_IP_POOL = "10.0.0.0/24"
+SERVER_IP_POOL = os.getenv('SERVER_IP_POOL', '10.0.0.0/24')
 DNS = "1.1.1.1"
 REG_TOKEN = os.getenv('REG_TOKEN')
 COUNTRY = os.getenv('COUNTRY')
@@ -31,19 +40,76 @@ NAME = os.getenv('NAME')
 MAX_COUNT_USERS = os.getenv('MAX_COUNT_USERS')
 TOKEN = os.getenv('TOKEN')
 MAIN_SERVER = os.getenv('MAIN_SERVER')
+KEY_POOL_SIZE = int(os.getenv('KEY_POOL_SIZE', 0))
+WG_BACKEND = os.getenv('WG_BACKEND', 'wg')
+WG_FAKE_DIR = os.getenv('WG_FAKE_DIR')
+BLOCKING_THREADS = int(os.getenv('BLOCKING_THREADS', 16))
+SAMPLER_INTERVAL = float(os.getenv('SAMPLER_INTERVAL', 5))
+RECONCILE_INTERVAL = float(os.getenv('RECONCILE_INTERVAL', 300))
+IDLE_TIMEOUT = float(os.getenv('IDLE_TIMEOUT', 30 * 24 * 3600))
+IDLE_SUSPEND = os.getenv('IDLE_SUSPEND', 'false').lower() in ('1', 'true', 'yes')
+IDLE_CHECK_INTERVAL = float(os.getenv('IDLE_CHECK_INTERVAL', 600))
+HEARTBEAT_INTERVAL = float(os.getenv('HEARTBEAT_INTERVAL', 30))
+VERSION = os.getenv('VERSION', 'dev')
+
+
+async def prepare_node():
+    """Схема БД, пул IP и аллокатор: до завершения клиентское API недоступно"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as db:
+        await init_ip_pool(db, SERVER_IP_POOL)
+        await ip_allocator.load(db, SERVER_IP_POOL)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Base.metadata.create_all(bind=engine)
-    db = next(get_db())
-    init_ip_pool(db, SERVER_IP_POOL, SERVER_IP_POOL)
-    register_server()
+    # Ограниченный пул потоков для блокирующих вызовов (asyncio.to_thread)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(
+            max_workers=BLOCKING_THREADS, thread_name_prefix="blocking"
+        )
+    )
+    get_wg_backend()
+    idle_peers.load()
+    # Подготовка и регистрация (после готовности) идут в фоне, сервер
+    # стартует сразу
+    startup_task = asyncio.create_task(startup.run(prepare_node))
+    registration_task = asyncio.create_task(registration.run())
+    key_pool.size = KEY_POOL_SIZE
+    key_pool_task = asyncio.create_task(key_pool.run())
+    wg_queue_task = asyncio.create_task(wg_queue.run())
+    system_sampler.interval = SAMPLER_INTERVAL
+    system_sampler.sample()
+    sampler_task = asyncio.create_task(system_sampler.run())
+    reconciler.interval = RECONCILE_INTERVAL
+    reconciler_task = asyncio.create_task(reconciler.run())
+    idle_peers.timeout = IDLE_TIMEOUT
+    idle_peers.suspend = IDLE_SUSPEND
+    idle_peers.interval = IDLE_CHECK_INTERVAL
+    idle_peers_task = asyncio.create_task(idle_peers.run())
+    heartbeat_sender.interval = HEARTBEAT_INTERVAL
+    heartbeat_task = asyncio.create_task(heartbeat_sender.run())
+    startup.serving()
     yield
+    heartbeat_task.cancel()
+    idle_peers_task.cancel()
+    reconciler_task.cancel()
+    sampler_task.cancel()
+    wg_queue_task.cancel()
+    key_pool_task.cancel()
+    registration_task.cancel()
+    startup_task.cancel()
 
 
 app = FastAPI(lifespan=lifespan)
 
-app.include_router(client_router, prefix="/client", tags=["client"])
+app.include_router(
+    client_router,
+    prefix="/client",
+    tags=["client"],
+    dependencies=[Depends(require_ready)]
+)
 app.include_router(status_router, prefix="/status", tags=["status"])
 app.include_router(metrics_router, prefix="/metrics", tags=["metrics"])
+app.include_router(peers_router, prefix="/peers", tags=["peers"])
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class CreateClientRequest(BaseModel):
@@ -6,6 +6,19 @@ class CreateClientRequest(BaseModel):
     config_name: str
 
 
+class CreateClientsRequest(BaseModel):
+    clients: list[CreateClientRequest] = Field(min_length=1, max_length=500)
+
+
 class DeleteClientRequest(BaseModel):
     user_id: int
     config_name: str
+
+
+class DeleteClientsRequest(BaseModel):
+    clients: list[DeleteClientRequest] = Field(min_length=1, max_length=500)
+
+
+class ResumeClientRequest(BaseModel):
+    user_id: int
+    config_name: str
@@ -0,0 +1,78 @@
+import os
+import asyncio
+from ipaddress import IPv4Network
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+os.environ.setdefault("WG_BACKEND", "fake")
+os.environ.setdefault("SERVER_PUBLIC_KEY", "server-public-key")
+os.environ.setdefault("SERVER_ENDPOINT", "203.0.113.1")
+
+import api.client  # noqa: E402
+import core.idle_peers  # noqa: E402
+import core.reconciler  # noqa: E402
+import core.wg  # noqa: E402
+import main_vpn  # noqa: E402
+from database.database import Base, SessionLocal, engine as default_engine  # noqa: E402
+from database.models import IPAddress  # noqa: E402
+from core.idle_peers import idle_peers  # noqa: E402
+from core.ip_allocator import ip_allocator  # noqa: E402
+from core.startup import startup  # noqa: E402
+from core.wg import FakeWGBackend  # noqa: E402
+from core.wg_queue import PeerMutationQueue  # noqa: E402
+
+
+POOL = "10.8.0.0/24"
+POOL_SIZE = 254
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def node(tmp_path, monkeypatch):
+    """
+    Нода на fake-backend WireGuard и файловой SQLite: клиент httpx к
+    приложению без lifespan, пул POOL загружен в аллокатор.
+    """
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'node.db'}",
+        connect_args={"timeout": 30},
+    )
+    SessionLocal.configure(bind=engine)
+    monkeypatch.setattr(main_vpn, "SERVER_IP_POOL", POOL)
+    monkeypatch.setattr(
+        core.wg, "_wg_backend", FakeWGBackend(str(tmp_path / "wg"))
+    )
+    queue = PeerMutationQueue()
+    for module in (api.client, core.idle_peers, core.reconciler):
+        monkeypatch.setattr(module, "wg_queue", queue)
+    for name in ("suspended", "_first_seen", "_resumed_at"):
+        monkeypatch.setattr(idle_peers, name, {})
+    monkeypatch.setattr(idle_peers, "_suspended_at", 0.0)
+
+    async def prepare():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with SessionLocal() as db:
+            db.add_all(
+                IPAddress(address=str(ip), is_used=False)
+                for ip in IPv4Network(POOL).hosts()
+            )
+            await db.commit()
+            await ip_allocator.load(db, POOL)
+
+    await startup.run(prepare)
+    queue_task = asyncio.create_task(queue.run())
+    transport = httpx.ASGITransport(app=main_vpn.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://node"
+    ) as client:
+        yield client
+    queue_task.cancel()
+    await engine.dispose()
+    SessionLocal.configure(bind=default_engine)
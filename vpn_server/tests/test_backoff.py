@@ -0,0 +1,15 @@
+import pytest
+
+from utils.backoff import backoff_delay
+
+
+@pytest.mark.parametrize("attempt", [1025, 1100, 10 ** 6])
+def test_large_attempt_is_capped(attempt):
+    delay = backoff_delay(attempt, cap=60.0)
+    assert 30.0 <= delay <= 60.0
+
+
+def test_delay_grows_with_jitter_until_cap():
+    for attempt, upper in [(1, 1.0), (2, 2.0), (5, 16.0), (20, 300.0)]:
+        delay = backoff_delay(attempt)
+        assert upper / 2 <= delay <= upper
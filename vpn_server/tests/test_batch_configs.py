@@ -0,0 +1,117 @@
+import pytest
+
+from core.ip_allocator import ip_allocator
+from core.wg import get_wg_backend
+from tests.conftest import POOL_SIZE
+from tests.test_generate_concurrency import ADDRESS, db_counts
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def generate_many(node, pairs: list[tuple[int, str]]):
+    return await node.post(
+        "/client/generate-configs/",
+        json={
+            "clients": [
+                {"user_id": user_id, "config_name": config_name}
+                for user_id, config_name in pairs
+            ]
+        },
+    )
+
+
+def failing_apply(changes):
+    raise RuntimeError("wg недоступен")
+
+
+async def test_generate_configs_duplicate_name_is_conflict(node):
+    response = await generate_many(node, [(1, "laptop")])
+    assert response.status_code == 200
+
+    response = await generate_many(node, [(2, "phone"), (1, "laptop")])
+
+    assert response.status_code == 409
+    free, clients = await db_counts()
+    assert clients == 1
+    assert free == ip_allocator.free_count == POOL_SIZE - 1
+    assert len(get_wg_backend().list_peers()) == 1
+    assert len(get_wg_backend().peer_store.list_peers()) == 1
+
+
+async def test_generate_configs_wg_failure_returns_ips(node, monkeypatch):
+    monkeypatch.setattr(get_wg_backend(), "apply_peers", failing_apply)
+
+    response = await generate_many(node, [(1, "laptop"), (2, "phone")])
+
+    assert response.status_code == 500
+    free, clients = await db_counts()
+    assert clients == 0
+    assert free == ip_allocator.free_count == POOL_SIZE
+
+
+async def delete_many(node, pairs: list[tuple[int, str]]):
+    return await node.post(
+        "/client/delete-configs/",
+        json={
+            "clients": [
+                {"user_id": user_id, "config_name": config_name}
+                for user_id, config_name in pairs
+            ]
+        },
+    )
+
+
+def statuses(response) -> list[tuple[int, str, str]]:
+    return [
+        (item["user_id"], item["config_name"], item["status"])
+        for item in response.json()["results"]
+    ]
+
+
+async def test_delete_configs_mixed_batch(node):
+    response = await generate_many(
+        node, [(1, "laptop"), (1, "phone"), (2, "tablet")]
+    )
+    kept = response.json()["configs"][2]
+
+    response = await delete_many(
+        node, [(1, "laptop"), (3, "missing"), (1, "phone"), (1, "laptop")]
+    )
+
+    assert response.status_code == 200
+    # Повтор пары получает тот же статус, что и первое вхождение
+    assert statuses(response) == [
+        (1, "laptop", "deleted"),
+        (3, "missing", "not_found"),
+        (1, "phone", "deleted"),
+        (1, "laptop", "deleted"),
+    ]
+    free, clients = await db_counts()
+    assert clients == 1
+    assert free == ip_allocator.free_count == POOL_SIZE - 1
+    backend = get_wg_backend()
+    address = ADDRESS.search(kept["config"]).group(1)
+    assert [peer.allowed_ips for peer in backend.list_peers()] == [
+        f"{address}/32"
+    ]
+    assert backend.peer_store.list_peers() == backend.list_peers()
+
+
+async def test_delete_configs_wg_failure_keeps_clients(node, monkeypatch):
+    await generate_many(node, [(1, "laptop"), (2, "phone")])
+    backend = get_wg_backend()
+    peers = backend.list_peers()
+    monkeypatch.setattr(backend, "apply_peers", failing_apply)
+
+    response = await delete_many(node, [(1, "laptop"), (3, "missing")])
+
+    assert response.status_code == 200
+    assert statuses(response) == [
+        (1, "laptop", "error"),
+        (3, "missing", "not_found"),
+    ]
+    free, clients = await db_counts()
+    assert clients == 2
+    assert free == ip_allocator.free_count == POOL_SIZE - 2
+    assert backend.list_peers() == peers
@@ -0,0 +1,96 @@
+import re
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from core.ip_allocator import ip_allocator
+from core.wg import get_wg_backend
+from database.database import SessionLocal
+from database.models import Clients, IPAddress
+from tests.conftest import POOL_SIZE
+
+
+pytestmark = pytest.mark.anyio
+
+ADDRESS = re.compile(r"^Address = ([\d.]+)/", re.M)
+
+
+async def generate(node, user_id: int, config_name: str):
+    return await node.post(
+        "/client/generate-config/",
+        json={"user_id": user_id, "config_name": config_name},
+    )
+
+
+async def db_counts() -> tuple[int, int]:
+    async with SessionLocal() as db:
+        free = await db.scalar(
+            select(func.count()).where(IPAddress.is_used.is_(False))
+        )
+        clients = await db.scalar(select(func.count()).select_from(Clients))
+    return free, clients
+
+
+async def test_concurrent_generate_exhausts_pool_without_duplicates(node):
+    requests = POOL_SIZE + 50
+    responses = await asyncio.gather(
+        *(generate(node, i, f"cfg-{i}") for i in range(requests))
+    )
+
+    ok = [response for response in responses if response.status_code == 200]
+    rejected = [
+        response for response in responses if response.status_code != 200
+    ]
+    assert len(ok) == POOL_SIZE
+    assert {response.status_code for response in rejected} == {400}
+
+    addresses = [ADDRESS.search(response.text).group(1) for response in ok]
+    assert len(set(addresses)) == POOL_SIZE
+
+    free, clients = await db_counts()
+    assert free == ip_allocator.free_count == 0
+    assert clients == POOL_SIZE
+    assert len(get_wg_backend().list_peers()) == POOL_SIZE
+
+
+async def test_concurrent_generate_and_delete_keep_counts_in_sync(node):
+    created = 200
+    await asyncio.gather(
+        *(generate(node, i, f"cfg-{i}") for i in range(created))
+    )
+
+    # Удаляем половину и одновременно создаем новых клиентов
+    deletes = [
+        node.post(
+            "/client/delete-config/",
+            json={"user_id": i, "config_name": f"cfg-{i}"},
+        )
+        for i in range(0, created, 2)
+    ]
+    generates = [
+        generate(node, i, f"cfg-{i}") for i in range(created, created + 100)
+    ]
+    responses = await asyncio.gather(*deletes, *generates)
+    assert all(response.status_code == 200 for response in responses)
+
+    expected = created - len(deletes) + len(generates)
+    free, clients = await db_counts()
+    assert clients == expected
+    assert free == ip_allocator.free_count == POOL_SIZE - expected
+    assert len(get_wg_backend().list_peers()) == expected
+
+
+async def test_concurrent_duplicate_names_roll_back(node):
+    responses = await asyncio.gather(
+        *(generate(node, i, "shared") for i in range(100))
+    )
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200] + [409] * 99
+
+    free, clients = await db_counts()
+    assert clients == 1
+    assert free == ip_allocator.free_count == POOL_SIZE - 1
+    assert len(get_wg_backend().list_peers()) == 1
+    assert len(get_wg_backend().peer_store.list_peers()) == 1
@@ -0,0 +1,153 @@
+import time
+
+import pytest
+
+from core.idle_peers import IdlePeerTracker, idle_peers
+from core.peer_stats import PeerStats, parse_dump, peer_stats
+from core.peer_store import PeerChange
+from core.reconciler import Reconciler
+from core.wg import get_wg_backend
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(peer_stats, "min_interval", 0.0)
+
+
+async def test_resume_after_restart_restores_peer_from_config(
+    node, fresh_stats
+):
+    response = await node.post(
+        "/client/generate-config/",
+        json={"user_id": 1, "config_name": "laptop"},
+    )
+    assert response.status_code == 200
+    backend = get_wg_backend()
+    (peer,) = backend.list_peers()
+
+    # Пир снят прошлым процессом: в wg0.conf он есть, в runtime и в
+    # suspended текущего процесса - нет
+    backend.apply_runtime([PeerChange(peer.public_key)])
+    assert peer.public_key not in idle_peers.suspended
+
+    response = await node.post(
+        "/client/resume-config/",
+        json={"user_id": 1, "config_name": "laptop"},
+    )
+    assert response.json() == {"status": "resumed"}
+    assert backend.list_peers() == [peer]
+
+    response = await node.post(
+        "/client/resume-config/",
+        json={"user_id": 1, "config_name": "laptop"},
+    )
+    assert response.json() == {"status": "active"}
+
+
+async def test_get_config_resumes_suspended_peer(node, fresh_stats):
+    await node.post(
+        "/client/generate-config/",
+        json={"user_id": 2, "config_name": "phone"},
+    )
+    backend = get_wg_backend()
+    (peer,) = backend.list_peers()
+    idle_peers.suspended[peer.public_key] = (0, 0.0)
+    backend.apply_runtime([PeerChange(peer.public_key)])
+
+    response = await node.get("/client/config/2/phone/")
+
+    assert response.status_code == 200
+    assert backend.list_peers() == [peer]
+    assert peer.public_key not in idle_peers.suspended
+
+
+def make_stats(taken_at: float, handshakes: dict[str, int]) -> PeerStats:
+    lines = ["private\tpublic\t51820\toff"]
+    lines.extend(
+        f"{key}\t(none)\t(none)\t10.8.0.2/32\t{handshake}\t0\t0\toff"
+        for key, handshake in handshakes.items()
+    )
+    return parse_dump("\n".join(lines), taken_at)
+
+
+def test_restart_counts_idle_from_last_handshake():
+    now = time.time()
+    tracker = IdlePeerTracker(timeout=100)
+
+    # Свежий процесс: пир с давним handshake сразу считается простаивающим,
+    # пир без handshake - только через timeout после первого появления
+    stats = make_stats(now, {"old": int(now) - 500, "new": 0})
+    assert [peer.public_key for peer in tracker._find_idle(stats, now)] == [
+        "old"
+    ]
+    later = now + 150
+    stats = make_stats(later, {"old": int(now) - 500, "new": 0})
+    assert {
+        peer.public_key for peer in tracker._find_idle(stats, later)
+    } == {"old", "new"}
+
+
+def test_resumed_peer_is_not_idle_until_timeout():
+    now = time.time()
+    tracker = IdlePeerTracker(timeout=100)
+    tracker._resumed_at["old"] = now
+
+    stats = make_stats(now + 50, {"old": int(now) - 500})
+    assert tracker._find_idle(stats, now + 50) == []
+    stats = make_stats(now + 150, {"old": int(now) - 500})
+    assert len(tracker._find_idle(stats, now + 150)) == 1
+
+
+async def test_suspended_peers_survive_restart(node, fresh_stats, monkeypatch):
+    await node.post(
+        "/client/generate-config/",
+        json={"user_id": 3, "config_name": "tablet"},
+    )
+    backend = get_wg_backend()
+    (peer,) = backend.list_peers()
+    monkeypatch.setattr(idle_peers, "timeout", 1)
+    monkeypatch.setattr(idle_peers, "suspend", True)
+    idle_peers._first_seen[peer.public_key] = time.time() - 10
+
+    idle = await idle_peers.sweep()
+    assert [p.public_key for p in idle] == [peer.public_key]
+    assert backend.list_peers() == []
+
+    # Новый процесс читает список снятых из файла, сверка пира не
+    # возвращает
+    restarted = IdlePeerTracker()
+    restarted.load()
+    assert restarted.suspended.keys() == {peer.public_key}
+    monkeypatch.setattr(idle_peers, "suspended", restarted.suspended)
+    reconciler = Reconciler()
+    for _ in range(2):
+        report = await reconciler.reconcile()
+        assert report.missing_peers == []
+    assert backend.list_peers() == []
+
+    response = await node.get("/client/config/3/tablet/")
+    assert response.status_code == 200
+    assert backend.list_peers() == [peer]
+    restarted = IdlePeerTracker()
+    restarted.load()
+    assert restarted.suspended == {}
+
+
+async def test_get_config_survives_resume_failure(node, monkeypatch):
+    await node.post(
+        "/client/generate-config/",
+        json={"user_id": 4, "config_name": "desktop"},
+    )
+
+    async def failing_resume(public_key: str) -> bool:
+        raise RuntimeError("wg недоступен")
+
+    monkeypatch.setattr(idle_peers, "resume", failing_resume)
+
+    response = await node.get("/client/config/4/desktop/")
+
+    assert response.status_code == 200
+    assert "PrivateKey" in response.text
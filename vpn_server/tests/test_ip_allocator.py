@@ -0,0 +1,132 @@
+from ipaddress import IPv4Network
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.ip_allocator import AllocatedIP, IPAllocator
+from database.database import Base
+from database.models import IPAddress
+
+
+pytestmark = pytest.mark.anyio
+
+SUBNET = "10.9.0.0/28"
+HOSTS = [str(ip) for ip in IPv4Network(SUBNET).hosts()]
+
+
+class MemoryIPRepository:
+    """ip_addresses в памяти с той же семантикой резерва, что у IPRepository"""
+
+    def __init__(self, rows: dict[int, SimpleNamespace]):
+        self.rows = rows
+        self.fail_reserve = False
+
+    async def reserve(self, ip_id: int, user_id: int, commit: bool = True):
+        if self.fail_reserve:
+            raise RuntimeError("db down")
+        row = self.rows[ip_id]
+        if row.is_used:
+            return False
+        row.is_used = True
+        return True
+
+    async def reserve_free_ip(self, user_id: int, commit: bool = True):
+        for row in self.rows.values():
+            if not row.is_used:
+                row.is_used = True
+                return row
+        return None
+
+    async def release(self, ip_id: int, commit: bool = True):
+        self.rows[ip_id].is_used = False
+
+
+@pytest.fixture
+async def loaded():
+    """Аллокатор, загруженный из SQLite, и репозиторий в памяти с теми же строками"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as db:
+        rows = [
+            IPAddress(id=i + 1, address=address, is_used=i < 3)
+            for i, address in enumerate(HOSTS)
+        ]
+        # Адрес вне подсети игнорируется при загрузке
+        rows.append(IPAddress(id=100, address="10.10.0.1", is_used=False))
+        db.add_all(rows)
+        await db.commit()
+
+        allocator = IPAllocator()
+        await allocator.load(db, SUBNET)
+    await engine.dispose()
+
+    repo = MemoryIPRepository({
+        row.id: SimpleNamespace(
+            id=row.id, address=row.address, is_used=row.is_used
+        )
+        for row in rows if row.id != 100
+    })
+    return allocator, repo
+
+
+async def test_load_counts_free_addresses(loaded):
+    allocator, _ = loaded
+    assert allocator.free_count == len(HOSTS) - 3
+
+
+async def test_allocates_every_free_address_once(loaded):
+    allocator, repo = loaded
+
+    allocated = []
+    while (ip := await allocator.allocate(repo, user_id=1)) is not None:
+        allocated.append(ip)
+
+    assert len(allocated) == len(HOSTS) - 3
+    assert len({ip.address for ip in allocated}) == len(allocated)
+    assert {ip.address for ip in allocated} == set(HOSTS[3:])
+    assert allocator.free_count == 0
+
+
+async def test_address_taken_elsewhere_is_skipped(loaded):
+    allocator, repo = loaded
+    # Все свободные по карте адреса, кроме одного, уже заняты другим воркером
+    for row in list(repo.rows.values())[3:-1]:
+        row.is_used = True
+
+    ip = await allocator.allocate(repo, user_id=1)
+
+    assert ip == AllocatedIP(len(HOSTS), HOSTS[-1])
+    assert allocator.free_count == 0
+    assert await allocator.allocate(repo, user_id=1) is None
+
+
+async def test_failed_reserve_returns_address_to_bitmap(loaded):
+    allocator, repo = loaded
+    free = allocator.free_count
+    repo.fail_reserve = True
+
+    with pytest.raises(RuntimeError):
+        await allocator.allocate(repo, user_id=1)
+
+    assert allocator.free_count == free
+
+
+async def test_free_put_back_and_mark_used_are_idempotent(loaded):
+    allocator, repo = loaded
+    free = allocator.free_count
+    ip = await allocator.allocate(repo, user_id=1)
+
+    await allocator.free(repo, ip)
+    allocator.put_back([ip])
+    assert allocator.free_count == free
+    assert not repo.rows[ip.id].is_used
+
+    allocator.mark_used([ip])
+    allocator.mark_used([ip])
+    assert allocator.free_count == free - 1
+
+    allocator.put_back([AllocatedIP(100, "10.10.0.1")])
+    assert allocator.free_count == free - 1
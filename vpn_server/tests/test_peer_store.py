@@ -0,0 +1,119 @@
+import os
+
+from core.peer_store import Peer, PeerChange, PeerStore
+
+
+CONFIG = """[Interface]
+PrivateKey = server-private
+Address = 10.0.0.1/24
+ListenPort = 51820
+
+[Peer]
+PublicKey = alice
+AllowedIPs = 10.0.0.2/32
+
+[Peer]
+# без ключа блок пропускается
+AllowedIPs = 10.0.0.9/32
+
+[Peer]
+PublicKey = bob
+PresharedKey = psk
+AllowedIPs = 10.0.0.3/32
+PersistentKeepalive = 25
+
+"""
+
+
+def store_with(tmp_path, content: str = CONFIG) -> PeerStore:
+    path = tmp_path / "wg0.conf"
+    path.write_text(content)
+    return PeerStore(path)
+
+
+def test_parses_peers_and_skips_blocks_without_key(tmp_path):
+    store = store_with(tmp_path)
+
+    assert store.list_peers() == [
+        Peer("alice", "10.0.0.2/32"),
+        Peer("bob", "10.0.0.3/32"),
+    ]
+    assert store.get("bob") == Peer("bob", "10.0.0.3/32")
+    assert store.get("carol") is None
+
+
+def test_write_keeps_interface_and_unknown_lines(tmp_path):
+    store = store_with(tmp_path)
+
+    store.add("carol", "10.0.0.4/32")
+
+    content = store.path.read_text()
+    assert content.startswith(
+        "[Interface]\nPrivateKey = server-private\n"
+        "Address = 10.0.0.1/24\nListenPort = 51820\n\n[Peer]\n"
+    )
+    assert "PresharedKey = psk\nAllowedIPs = 10.0.0.3/32\n" in content
+    assert content.endswith(
+        "[Peer]\nPublicKey = carol\nAllowedIPs = 10.0.0.4/32\n"
+    )
+    assert PeerStore(store.path).list_peers() == store.list_peers()
+
+
+def test_apply_batches_adds_replacements_and_deletes(tmp_path):
+    store = store_with(tmp_path)
+
+    store.apply([
+        PeerChange("carol", "10.0.0.4/32"),
+        PeerChange("alice"),
+        PeerChange("bob", "10.0.0.5/32"),
+        PeerChange("missing"),
+    ])
+
+    assert store.list_peers() == [
+        Peer("bob", "10.0.0.5/32"),
+        Peer("carol", "10.0.0.4/32"),
+    ]
+    assert not [
+        name for name in os.listdir(tmp_path) if name.startswith(".wg0.conf.")
+    ]
+
+
+def test_delete_reports_missing_peer(tmp_path):
+    store = store_with(tmp_path)
+
+    assert store.delete("alice")
+    assert not store.delete("alice")
+    assert [peer.public_key for peer in store.list_peers()] == ["bob"]
+
+
+def test_noop_apply_does_not_rewrite_file(tmp_path):
+    store = store_with(tmp_path)
+    before = store.path.stat().st_mtime_ns
+
+    store.apply([PeerChange("missing")])
+
+    assert store.path.read_text() == CONFIG
+    assert store.path.stat().st_mtime_ns == before
+
+
+def test_external_edit_is_picked_up(tmp_path):
+    store = store_with(tmp_path)
+    store.list_peers()
+
+    store.path.write_text(
+        "[Interface]\nPrivateKey = k\n\n"
+        "[Peer]\nPublicKey = dave\nAllowedIPs = 10.0.0.6/32\n"
+    )
+
+    assert store.list_peers() == [Peer("dave", "10.0.0.6/32")]
+
+
+def test_missing_file_is_empty_and_created_on_write(tmp_path):
+    store = PeerStore(tmp_path / "wg0.conf")
+
+    assert store.list_peers() == []
+    store.add("alice", "10.0.0.2/32")
+
+    assert store.path.read_text() == (
+        "[Peer]\nPublicKey = alice\nAllowedIPs = 10.0.0.2/32\n"
+    )
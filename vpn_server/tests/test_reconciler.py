@@ -0,0 +1,119 @@
+import pytest
+from sqlalchemy import select, update
+
+from core.idle_peers import idle_peers
+from core.ip_allocator import AllocatedIP, ip_allocator
+from core.peer_store import PeerChange
+from core.reconciler import Reconciler
+from core.wg import get_wg_backend
+from database.database import SessionLocal
+from database.models import Clients, IPAddress
+from database.repository import IPRepository
+from tests.test_generate_concurrency import db_counts, generate
+
+
+pytestmark = pytest.mark.anyio
+
+ORPHAN_KEY = "orphan-public-key"
+
+
+async def client_ip(user_id: int, config_name: str) -> IPAddress:
+    async with SessionLocal() as db:
+        return await db.scalar(
+            select(IPAddress)
+            .join(Clients, Clients.ip_address == IPAddress.id)
+            .where(
+                Clients.client_id == user_id,
+                Clients.config_name == config_name,
+            )
+        )
+
+
+async def set_ip_used(address: str, is_used: bool) -> int:
+    async with SessionLocal() as db:
+        ip_id = await db.scalar(
+            update(IPAddress)
+            .where(IPAddress.address == address)
+            .values(is_used=is_used, client_id=0)
+            .returning(IPAddress.id)
+        )
+        await db.commit()
+    return ip_id
+
+
+async def test_orphan_peer_removed_on_second_pass(node):
+    backend = get_wg_backend()
+    backend.apply_peers([PeerChange(ORPHAN_KEY, "10.8.0.200/32")])
+    reconciler = Reconciler()
+
+    report = await reconciler.reconcile()
+    assert report.orphan_peers == []
+    assert report.pending == 1
+    assert [peer.public_key for peer in backend.list_peers()] == [ORPHAN_KEY]
+
+    report = await reconciler.reconcile()
+    assert report.orphan_peers == [ORPHAN_KEY]
+    assert backend.list_peers() == []
+    assert backend.peer_store.list_peers() == []
+
+
+async def test_leaked_ip_freed_but_not_while_referenced(node):
+    await generate(node, 1, "laptop")
+    used = await client_ip(1, "laptop")
+    leaked = "10.8.0.250"
+    leaked_id = await set_ip_used(leaked, True)
+    ip_allocator.mark_used([AllocatedIP(leaked_id, leaked)])
+    reconciler = Reconciler()
+
+    assert (await reconciler.reconcile()).leaked_ips == []
+    report = await reconciler.reconcile()
+
+    assert report.leaked_ips == [leaked]
+    free, _ = await db_counts()
+    assert free == ip_allocator.free_count
+    assert (await client_ip(1, "laptop")).is_used
+
+    # Клиент, появившийся между проходами, защищает адрес на уровне SQL
+    async with SessionLocal() as db:
+        released = await IPRepository(db).release_unreferenced(
+            [used.id, leaked_id]
+        )
+    assert released == []
+    assert (await client_ip(1, "laptop")).is_used
+
+
+async def test_client_ip_free_in_db_is_marked_used(node):
+    await generate(node, 1, "laptop")
+    ip = await client_ip(1, "laptop")
+    await set_ip_used(ip.address, False)
+    reconciler = Reconciler()
+
+    assert (await reconciler.reconcile()).unmarked_ips == []
+    report = await reconciler.reconcile()
+
+    assert report.unmarked_ips == [ip.address]
+    restored = await client_ip(1, "laptop")
+    assert restored.is_used and restored.client_id == 1
+    free, _ = await db_counts()
+    assert free == ip_allocator.free_count
+
+
+async def test_suspended_peer_is_not_re_added(node):
+    await generate(node, 1, "laptop")
+    await generate(node, 2, "phone")
+    backend = get_wg_backend()
+    suspended, removed = sorted(
+        backend.list_peers(), key=lambda peer: peer.allowed_ips
+    )
+    idle_peers.suspended[suspended.public_key] = (0, 0.0)
+    backend.apply_runtime(
+        [PeerChange(suspended.public_key), PeerChange(removed.public_key)]
+    )
+    reconciler = Reconciler()
+
+    await reconciler.reconcile()
+    report = await reconciler.reconcile()
+
+    # Пропавший пир возвращается, снятый за неактивность - нет
+    assert report.missing_peers == [removed.public_key]
+    assert backend.list_peers() == [removed]
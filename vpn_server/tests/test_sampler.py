@@ -0,0 +1,18 @@
+import core.sampler
+from core.sampler import SystemSampler
+
+
+def test_window_does_not_depend_on_interval(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(core.sampler.time, "time", lambda: now[0])
+    sampler = SystemSampler(interval=5.0, window=300.0)
+    # Шаг меняется после создания, как в lifespan
+    sampler.interval = 1.0
+
+    for _ in range(400):
+        sampler.sample()
+        now[0] += 1.0
+
+    assert sampler.latest().taken_at == 1399.0
+    assert sampler._samples[0].taken_at == 1099.0
+    assert sampler.average(300).taken_at == 1399.0
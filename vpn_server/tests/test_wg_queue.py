@@ -0,0 +1,121 @@
+import asyncio
+import subprocess
+
+import pytest
+
+import core.wg_queue
+from core.metrics import ApplyTimings
+from core.peer_store import PeerChange
+from core.wg import FakeWGBackend, coalesce_changes
+from core.wg_queue import PeerMutationQueue
+
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingBackend(FakeWGBackend):
+    """Fake-backend, который запоминает пачки и роняет пачки с ключами из fail"""
+
+    def __init__(self, config_dir: str):
+        super().__init__(config_dir)
+        self.batches: list[list[PeerChange]] = []
+        self.fail: set[str] = set()
+
+    def apply_peers(self, changes: list[PeerChange]) -> ApplyTimings:
+        self.batches.append(list(changes))
+        if self.fail & {change.public_key for change in changes}:
+            raise subprocess.CalledProcessError(1, "wg")
+        return super().apply_peers(changes)
+
+
+@pytest.fixture
+async def queue(tmp_path, monkeypatch):
+    backend = RecordingBackend(str(tmp_path))
+    monkeypatch.setattr(core.wg_queue, "get_wg_backend", lambda: backend)
+    queue = PeerMutationQueue(window=0.05, max_batch=1000)
+    task = asyncio.create_task(queue.run())
+    yield queue, backend
+    task.cancel()
+
+
+def test_coalesce_keeps_last_change_per_key():
+    changes = [
+        PeerChange("a", "10.0.0.2/32"),
+        PeerChange("b", "10.0.0.3/32"),
+        PeerChange("a"),
+    ]
+
+    assert coalesce_changes(changes) == [
+        PeerChange("a"), PeerChange("b", "10.0.0.3/32")
+    ]
+
+
+async def test_concurrent_changes_share_one_apply(queue):
+    queue, backend = queue
+
+    results = await asyncio.gather(
+        *(queue.add_peer(f"key-{i}", f"10.0.0.{i + 2}") for i in range(50))
+    )
+
+    assert len(backend.batches) == 1
+    assert len(backend.batches[0]) == 50
+    assert all(result == results[0] for result in results)
+    assert len(backend.list_peers()) == 50
+    assert len(backend.peer_store.list_peers()) == 50
+
+
+async def test_add_then_remove_in_one_batch_leaves_no_peer(queue):
+    queue, backend = queue
+
+    await asyncio.gather(
+        queue.add_peer("key", "10.0.0.2"), queue.remove_peer("key")
+    )
+
+    assert len(backend.batches) == 1
+    assert backend.list_peers() == []
+    assert backend.peer_store.list_peers() == []
+
+
+async def test_failed_batch_is_retried_one_by_one(queue):
+    queue, backend = queue
+    backend.fail = {"bad"}
+
+    results = await asyncio.gather(
+        queue.add_peer("good-1", "10.0.0.2"),
+        queue.add_peer("bad", "10.0.0.3"),
+        queue.add_peer("good-2", "10.0.0.4"),
+        return_exceptions=True,
+    )
+
+    assert isinstance(results[1], subprocess.CalledProcessError)
+    assert isinstance(results[0], ApplyTimings)
+    assert isinstance(results[2], ApplyTimings)
+    # Общая пачка и по одной попытке на каждого вызывающего
+    assert [len(batch) for batch in backend.batches] == [3, 1, 1, 1]
+    assert {peer.public_key for peer in backend.list_peers()} == {
+        "good-1", "good-2"
+    }
+
+
+async def test_single_failure_reaches_caller(queue):
+    queue, backend = queue
+    backend.fail = {"bad"}
+
+    with pytest.raises(subprocess.CalledProcessError):
+        await queue.add_peer("bad", "10.0.0.2")
+
+    assert len(backend.batches) == 1
+
+
+async def test_batch_size_is_bounded(tmp_path, monkeypatch):
+    backend = RecordingBackend(str(tmp_path))
+    monkeypatch.setattr(core.wg_queue, "get_wg_backend", lambda: backend)
+    queue = PeerMutationQueue(window=0.05, max_batch=10)
+    task = asyncio.create_task(queue.run())
+
+    await asyncio.gather(
+        *(queue.add_peer(f"key-{i}", f"10.0.0.{i + 2}") for i in range(25))
+    )
+    task.cancel()
+
+    assert [len(batch) for batch in backend.batches] == [10, 10, 5]
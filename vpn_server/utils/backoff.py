@@ -0,0 +1,14 @@
+import random
+
+
+MAX_EXPONENT = 32
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 300.0) -> float:
+    """
+    Задержка перед повтором номер attempt (с 1): экспоненциальный рост до
+    cap со случайным разбросом, чтобы ноды не повторяли запросы хором.
+    """
+    # Степень ограничена: после ~1000 попыток 2 ** n не влезает во float
+    delay = min(cap, base * 2 ** min(attempt - 1, MAX_EXPONENT))
+    return random.uniform(delay / 2, delay)